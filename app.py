@@ -1,17 +1,15 @@
 import streamlit as st
 import os
 from core.main import RagSystem
+from core.config import validate_config, ADAPTIVE_RETRIEVAL
 from pathlib import Path
 
-from groq import Groq
-
-api_key = st.secrets.get("GROQ_API_KEY") or os.getenv("GROQ_API_KEY")
-
-if not api_key:
-    st.error("Groq API key not found")
+try:
+    validate_config()
+except ValueError as e:
+    st.error(str(e))
     st.stop()
 
-client = Groq(api_key=api_key)
 # Page configuration
 st.set_page_config(
     page_title="RAG Knowledge Assistant",
@@ -64,6 +62,19 @@ if 'rag_system' not in st.session_state:
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 
+def render_sources(sources, key_prefix):
+    """Show sources; chunk text is only fetched when the user asks for it."""
+    with st.expander(f"📚 Sources ({len(sources)})"):
+        for i, source in enumerate(sources, 1):
+            st.markdown(f"""
+            <div class="source-box">
+                <strong>Source {i}: {source['filename']}</strong><br>
+                Page: {source['page']} | Chunk: {source['chunk_id']} | Score: {source.get('score', 'N/A')}
+            </div>
+            """, unsafe_allow_html=True)
+            if source.get('id') and st.checkbox("Show excerpt", key=f"{key_prefix}-{i}"):
+                st.caption(st.session_state.rag_system.get_source_text(source))
+
 # Header
 st.markdown('<h1 class="main-header">🤖 RAG Knowledge Assistant</h1>', unsafe_allow_html=True)
 
@@ -71,12 +82,17 @@ st.markdown('<h1 class="main-header">🤖 RAG Knowledge Assistant</h1>', unsafe_
 with st.sidebar:
     st.header("📁 Document Management")
     
+    # Read-only replicas serve published index versions; uploads go to the ingestion app
+    read_only = st.session_state.initialized and st.session_state.rag_system.vector_db.read_only
+    if read_only:
+        st.info("🔒 Read-only replica: serving the latest published index.")
+    
     # Upload documents
-    uploaded_files = st.file_uploader(
+    uploaded_files = None if read_only else st.file_uploader(
         "Upload Documents",
-        type=['pdf', 'docx', 'doc', 'txt'],
+        type=['pdf', 'docx', 'doc', 'txt', 'md'],
         accept_multiple_files=True,
-        help="Upload PDF, DOCX, DOC, or TXT files"
+        help="Upload PDF, DOCX, DOC, TXT or MD files"
     )
     
     if uploaded_files:
@@ -134,7 +150,11 @@ with st.sidebar:
     
     # Settings
     st.header("⚙️ Settings")
-    top_k = st.slider("Number of sources", 1, 10, 4)
+    top_k = st.slider(
+        "Max number of sources" if ADAPTIVE_RETRIEVAL else "Number of sources",
+        1, 10, 4,
+        help="Only sources above the relevance cutoff are used" if ADAPTIVE_RETRIEVAL else None
+    )
     
     if st.button("🗑️ Clear Chat History"):
         st.session_state.chat_history = []
@@ -144,7 +164,7 @@ with st.sidebar:
 st.header("💬 Ask Questions")
 
 # Display chat history
-for chat in st.session_state.chat_history:
+for turn, chat in enumerate(st.session_state.chat_history):
     # User question
     with st.chat_message("user"):
         st.write(chat['question'])
@@ -155,15 +175,7 @@ for chat in st.session_state.chat_history:
         
         # Show sources
         if chat.get('sources'):
-            with st.expander(f"📚 Sources ({len(chat['sources'])})"):
-                for i, source in enumerate(chat['sources'], 1):
-                    st.markdown(f"""
-                    <div class="source-box">
-                        <strong>Source {i}: {source['filename']}</strong><br>
-                        Page: {source['page']} | Chunk: {source['chunk_id']}<br>
-                        <em>{source['content'][:150]}...</em>
-                    </div>
-                    """, unsafe_allow_html=True)
+            render_sources(chat['sources'], key_prefix=f"source-{turn}")
 
 # Question input
 if st.session_state.initialized:
@@ -184,17 +196,9 @@ if st.session_state.initialized:
                 
                 # Display sources
                 if result.get('sources'):
-                    with st.expander(f"📚 Sources ({len(result['sources'])})"):
-                        for i, source in enumerate(result['sources'], 1):
-                            st.markdown(f"""
-                            <div class="source-box">
-                                <strong>Source {i}: {source['filename']}</strong><br>
-                                Page: {source['page']} | Chunk: {source['chunk_id']}<br>
-                                <em>{source['content'][:150]}...</em>
-                            </div>
-                            """, unsafe_allow_html=True)
+                    render_sources(result['sources'], key_prefix=f"source-{len(st.session_state.chat_history)}")
         
-        # Save to history
+        # Save to history (sources are lightweight: ids and compact metadata)
         st.session_state.chat_history.append({
             'question': question,
             'answer': result['answer'],
@@ -0,0 +1,336 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import resource
+import threading
+from pathlib import Path
+from collections import defaultdict
+from typing import Dict, List, Optional
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.main import RagSystem
+from core.llm_providers import StubProvider
+
+'''
+Concurrent-user load and soak test for RagSystem.
+
+N simulated users share one RagSystem (or get one each with
+--per-user-systems, like separate Streamlit sessions) and issue a mix of
+uploads and questions for --duration seconds. Answers come from the local
+StubProvider, so the run measures retrieval, ingestion and memory, not a
+hosted model. Every user keeps a growing chat history like the app does.
+
+    python benchmarks/load_test.py --users 8 --duration 60
+    python benchmarks/load_test.py --users 32 --duration 3600 --ingest-ratio 0.05 --json soak.json
+
+Reports throughput, latency percentiles and error rate per operation, and
+RSS sampled every --report-interval seconds (with MB/hour growth over the
+second half of the run, the number to watch in a soak).
+'''
+
+TOPICS = {
+    "solar": "photovoltaic panels convert sunlight into electricity using silicon cells and inverters",
+    "rivers": "river deltas form where sediment carried downstream settles as the current slows",
+    "vaccines": "vaccines train the immune system by presenting harmless antigens to memory cells",
+    "compilers": "compilers translate source code into machine code through parsing and optimisation passes",
+    "coffee": "coffee beans are roasted to develop aroma compounds through the maillard reaction",
+    "glaciers": "glaciers move slowly downhill as compacted snow deforms under its own weight",
+    "markets": "stock markets match buy and sell orders and publish prices continuously during the day",
+    "bees": "honey bees communicate the location of flowers through a waggle dance inside the hive",
+    "tides": "ocean tides rise and fall twice a day because of the gravitational pull of the moon",
+    "batteries": "lithium ion batteries store energy by moving ions between the anode and the cathode"
+}
+
+FILLER = ("the report also lists background notes references appendix tables and figures "
+          "that describe the method results and the limits of the study in more detail").split()
+
+QUESTIONS = [
+    "How do {topic} work?",
+    "What does the document say about {topic}?",
+    "Explain {topic} in one sentence.",
+    "Which process is described for {topic}?"
+]
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        # Peak RSS (KB on Linux) where /proc is not available
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_document(directory: str, rng: random.Random, paragraphs: int) -> str:
+    """Write a synthetic text document about a few random topics."""
+    topics = rng.sample(sorted(TOPICS), k=min(3, len(TOPICS)))
+    lines = []
+    for _ in range(paragraphs):
+        topic = rng.choice(topics)
+        filler = " ".join(rng.choices(FILLER, k=40))
+        lines.append(f"{topic.capitalize()}: {TOPICS[topic]}. {filler}.")
+    path = os.path.join(directory, f"doc-{rng.getrandbits(48):012x}.txt")
+    with open(path, "w") as f:
+        f.write("\n\n".join(lines))
+    return path
+
+
+class LoadStats:
+    """Thread-safe latency and error counters per operation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.error_samples: List[str] = []
+        self.rss: List[Dict] = []
+
+    def record(self, op: str, latency_ms: float, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.latencies[op].append(latency_ms)
+            if error:
+                self.errors[op] += 1
+                if len(self.error_samples) < 20:
+                    self.error_samples.append(f"{op}: {error}")
+
+    def snapshot(self) -> Dict[str, List[float]]:
+        with self._lock:
+            return {op: list(values) for op, values in self.latencies.items()}
+
+    def total_errors(self) -> int:
+        with self._lock:
+            return sum(self.errors.values())
+
+
+def percentiles(values: List[float]) -> Dict:
+    if not values:
+        return {"count": 0}
+    data = np.asarray(values)
+    return {
+        "count": len(values),
+        "p50_ms": round(float(np.percentile(data, 50)), 2),
+        "p90_ms": round(float(np.percentile(data, 90)), 2),
+        "p95_ms": round(float(np.percentile(data, 95)), 2),
+        "p99_ms": round(float(np.percentile(data, 99)), 2),
+        "max_ms": round(float(data.max()), 2)
+    }
+
+
+def rss_growth_mb_per_hour(samples: List[Dict]) -> Optional[float]:
+    # Ignore the first half: model loading and warm-up caches dominate it
+    tail = samples[len(samples) // 2:]
+    if len(tail) < 3:
+        return None
+    t = np.array([s["elapsed_s"] for s in tail])
+    mb = np.array([s["rss_mb"] for s in tail])
+    if np.ptp(t) == 0:
+        return None
+    slope = np.polyfit(t, mb, 1)[0]
+    return round(float(slope) * 3600, 1)
+
+
+class SimulatedUser(threading.Thread):
+
+    def __init__(self, user_id: int, system: RagSystem, stats: LoadStats, stop: threading.Event,
+                 args: argparse.Namespace, doc_dir: str):
+        super().__init__(name=f"user-{user_id}", daemon=True)
+        self.system = system
+        self.stats = stats
+        self.stop_event = stop
+        self.args = args
+        self.doc_dir = doc_dir
+        self.rng = random.Random(args.seed * 1000 + user_id)
+        self.chat_history: List[Dict] = []
+
+    def ask(self) -> None:
+        topic = self.rng.choice(sorted(TOPICS))
+        question = self.rng.choice(QUESTIONS).format(topic=topic)
+        start = time.perf_counter()
+        try:
+            result = self.system.ask_with_sources(question, top_k=self.args.top_k)
+        except Exception as e:
+            self.stats.record("ask", (time.perf_counter() - start) * 1000, repr(e))
+            return
+        latency = (time.perf_counter() - start) * 1000
+
+        # RagSystem reports failures in the answer rather than raising
+        answer = result.get("answer", "")
+        error = answer if answer.startswith("Error:") or answer.startswith("No documents indexed") else None
+        self.stats.record("ask", latency, error)
+
+        # Same shape the app keeps in st.session_state.chat_history
+        self.chat_history.append({"question": question, "answer": answer, "sources": result.get("sources", [])})
+        if self.args.max_history and len(self.chat_history) > self.args.max_history:
+            self.chat_history.pop(0)
+
+    def ingest(self) -> None:
+        path = write_document(self.doc_dir, self.rng, self.args.paragraphs)
+        start = time.perf_counter()
+        try:
+            ok = self.system.add_document(path)
+            error = None if ok else "add_document returned False"
+        except Exception as e:
+            error = repr(e)
+        self.stats.record("ingest", (time.perf_counter() - start) * 1000, error)
+
+    def run(self) -> None:
+        while not self.stop_event.is_set():
+            if self.rng.random() < self.args.ingest_ratio:
+                self.ingest()
+            else:
+                self.ask()
+            if self.args.think_ms:
+                # Exponential think time, like independent users
+                self.stop_event.wait(self.rng.expovariate(1000 / self.args.think_ms))
+
+
+def run_load(args: argparse.Namespace) -> Dict:
+    workdir = args.workdir or tempfile.mkdtemp(prefix="rag-load-")
+    doc_dir = os.path.join(workdir, "docs")
+    os.makedirs(doc_dir, exist_ok=True)
+    rng = random.Random(args.seed)
+    stats = LoadStats()
+    start_rss = rss_mb()
+
+    def make_system() -> RagSystem:
+        llm = StubProvider(first_token_ms=args.stub_first_token_ms, token_ms=args.stub_token_ms)
+        return RagSystem(llm_provider=llm, persist_directory=os.path.join(workdir, "index"))
+
+    # Step 1: seed the index so the first questions have something to find
+    shared = make_system()
+    seed_docs = [write_document(doc_dir, rng, args.paragraphs) for _ in range(args.seed_docs)]
+    if seed_docs and not shared.add_documents(seed_docs):
+        raise RuntimeError("Could not seed the index")
+    print(f"Seeded {len(seed_docs)} documents in {workdir} (RSS {rss_mb():.0f} MB)")
+
+    # Step 2: start the users, ramping up evenly
+    stop = threading.Event()
+    users = []
+    for i in range(args.users):
+        system = make_system() if args.per_user_systems and i else shared
+        user = SimulatedUser(i, system, stats, stop, args, doc_dir)
+        users.append(user)
+
+    started = time.perf_counter()
+    for user in users:
+        user.start()
+        if args.ramp_up:
+            time.sleep(args.ramp_up / len(users))
+
+    # Step 3: sample RSS and print progress until the duration is over
+    last_count = 0
+    while True:
+        elapsed = time.perf_counter() - started
+        if elapsed >= args.duration:
+            break
+        stop.wait(min(args.report_interval, args.duration - elapsed))
+        elapsed = time.perf_counter() - started
+        latencies = stats.snapshot()
+        count = sum(len(v) for v in latencies.values())
+        asks = percentiles(latencies.get("ask", []))
+        sample = {"elapsed_s": round(elapsed, 1), "rss_mb": round(rss_mb(), 1), "ops": count}
+        stats.rss.append(sample)
+        print(
+            f"[{elapsed:7.1f}s] ops={count} (+{(count - last_count) / args.report_interval:.1f}/s) "
+            f"ask p95={asks.get('p95_ms', 0)} ms errors={stats.total_errors()} rss={sample['rss_mb']} MB"
+        )
+        last_count = count
+
+    stop.set()
+    for user in users:
+        user.join(timeout=args.join_timeout)
+    elapsed = time.perf_counter() - started
+
+    # Step 4: summarize
+    latencies = stats.snapshot()
+    total = sum(len(v) for v in latencies.values())
+    report = {
+        "users": args.users,
+        "per_user_systems": args.per_user_systems,
+        "duration_s": round(elapsed, 1),
+        "ingest_ratio": args.ingest_ratio,
+        "think_ms": args.think_ms,
+        "throughput_ops_s": round(total / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(stats.total_errors() / total, 4) if total else 0.0,
+        "operations": {
+            op: {**percentiles(values), "errors": stats.errors.get(op, 0),
+                 "throughput_s": round(len(values) / elapsed, 2)}
+            for op, values in latencies.items()
+        },
+        "rss_mb": {
+            "start": round(start_rss, 1),
+            "end": round(rss_mb(), 1),
+            "peak": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "growth_mb_per_hour": rss_growth_mb_per_hour(stats.rss),
+            "samples": stats.rss
+        },
+        "chat_history_turns": sum(len(user.chat_history) for user in users),
+        "index": {k: v for k, v in shared.get_stats().items() if k != "indexed_files"},
+        "error_samples": stats.error_samples
+    }
+
+    if not args.keep and not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def print_report(report: Dict) -> None:
+    print(f"\n{report['users']} users, {report['duration_s']} s: "
+          f"{report['throughput_ops_s']} ops/s, error rate {report['error_rate']:.2%}")
+    columns = ["count", "throughput_s", "p50_ms", "p90_ms", "p95_ms", "p99_ms", "max_ms", "errors"]
+    print("op     | " + " | ".join(columns))
+    for op, row in report["operations"].items():
+        print(f"{op:<6} | " + " | ".join(str(row.get(c, "-")) for c in columns))
+    rss = report["rss_mb"]
+    print(f"RSS: start {rss['start']} MB, end {rss['end']} MB, peak {rss['peak']} MB, "
+          f"growth {rss['growth_mb_per_hour']} MB/h")
+    for sample in report["error_samples"][:5]:
+        print(f"  error: {sample}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Concurrent-user load and soak test for RagSystem")
+    parser.add_argument("--users", type=int, default=8, help="Simulated concurrent users")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to run (use hours for a soak)")
+    parser.add_argument("--ramp-up", type=float, default=0, help="Seconds over which users are started")
+    parser.add_argument("--ingest-ratio", type=float, default=0.1, help="Fraction of operations that upload a document")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between a user's operations")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--seed-docs", type=int, default=5, help="Documents indexed before the run")
+    parser.add_argument("--paragraphs", type=int, default=20, help="Paragraphs per generated document")
+    parser.add_argument("--max-history", type=int, default=0, help="Cap chat history per user (0 = unbounded, like the app)")
+    parser.add_argument("--per-user-systems", action="store_true", help="One RagSystem per user, like separate sessions")
+    parser.add_argument("--stub-first-token-ms", type=float, default=0, help="Simulated LLM time to first token")
+    parser.add_argument("--stub-token-ms", type=float, default=0, help="Simulated LLM time per token")
+    parser.add_argument("--report-interval", type=float, default=10, help="Seconds between progress lines / RSS samples")
+    parser.add_argument("--join-timeout", type=float, default=60, help="Seconds to wait for in-flight operations at the end")
+    parser.add_argument("--workdir", help="Index and documents directory (default: a temp dir, removed afterwards)")
+    parser.add_argument("--keep", action="store_true", help="Keep the temp workdir")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="Keep per-request INFO logs")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    report = run_load(args)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.snapshot import read_snapshot_header, SnapshotIndex
+from core.vector_codecs import get_codec
+from core.config import RESCORE_FACTOR, RESCORE_MIN_CANDIDATES
+
+'''
+Recall@k of compressed vector codecs versus exact search.
+
+Corpus: a clustered synthetic corpus shaped like MiniLM embeddings (ground
+truth: exact float32 search), or the vectors of an existing snapshot
+(--snapshot). Snapshots only store float16 vectors, so there the ground
+truth is exact search on those float16 vectors, not the float32 originals.
+Queries are corpus vectors with added noise, so every query has a known
+neighbourhood.
+
+Storage is reported per vector twice: resident bytes are the codes, which
+every query scans (the snapshot file); on-disk bytes add the float16 row kept
+in the .rescore side file, which is only read for the re-scored candidates.
+The summary compares each compressed codec with float16 at equal recall.
+
+    python benchmarks/vector_compression.py --snapshot chroma_db/versions/index-....ragsnap
+    python benchmarks/vector_compression.py --synthetic 100000 --codecs float16 int8 pq
+'''
+
+
+def synthetic_corpus(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def snapshot_corpus(path: str) -> np.ndarray:
+    header, _ = read_snapshot_header(path)
+    index = SnapshotIndex(path, expected_model=header["embedding_model"])
+    return np.asarray(index.vectors, dtype=np.float32)
+
+
+def make_queries(corpus: np.ndarray, n: int, noise: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    base = corpus[rng.choice(len(corpus), n, replace=len(corpus) < n)]
+    queries = base + noise * rng.standard_normal(base.shape).astype(np.float32) / np.sqrt(base.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    return len(set(found.tolist()) & set(truth.tolist())) / len(truth)
+
+
+def run(corpus: np.ndarray, queries: np.ndarray, codecs: List[str], k: int,
+        rescore_factor: int, rescore_min: int) -> List[Dict]:
+    """Recall@k per codec against exact search on corpus (as float32 arithmetic)."""
+    truth = [top_k(corpus @ q, k) for q in queries]
+    exact16 = corpus.astype(np.float16)
+    candidates = max(k * rescore_factor, rescore_min)
+    rows = []
+
+    for name in codecs:
+        codec = get_codec(name)
+        start = time.perf_counter()
+        codec.fit(corpus)
+        codes = codec.encode(corpus)
+        build_s = time.perf_counter() - start
+
+        approx_recall, rescored_recall = [], []
+        start = time.perf_counter()
+        for q, t in zip(queries, truth):
+            approx = codec.score(codes, q)
+            approx_recall.append(recall(top_k(approx, k), t))
+            if codec.needs_rescoring:
+                cand = top_k(approx, candidates)
+                exact = exact16[cand].astype(np.float32) @ q
+                rescored_recall.append(recall(cand[top_k(exact, k)], t))
+            else:
+                rescored_recall.append(approx_recall[-1])
+        query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        # Queries scan the codes; the float16 row sits in the side file for re-scoring
+        resident_bytes = codes[0].nbytes
+        on_disk_bytes = resident_bytes + (exact16[0].nbytes if codec.needs_rescoring else 0)
+        rows.append({
+            "codec": name,
+            "resident_bytes": resident_bytes,
+            "on_disk_bytes": on_disk_bytes,
+            "resident_vs_float32": round(corpus.shape[1] * 4 / resident_bytes, 2),
+            f"recall@{k}_codes_only": round(float(np.mean(approx_recall)), 4),
+            f"recall@{k}_rescored": round(float(np.mean(rescored_recall)), 4),
+            "query_ms": round(query_ms, 3),
+            "build_s": round(build_s, 2)
+        })
+    return rows
+
+
+def compare_to_float16(rows: List[Dict], k: int, tolerance: float = 0.005) -> List[str]:
+    """One line per compressed codec: resident bytes against float16 at equal re-scored recall."""
+    baseline = next((row for row in rows if row["codec"] == "float16"), None)
+    if baseline is None:
+        return []
+    key = f"recall@{k}_rescored"
+    lines = []
+    for row in rows:
+        if row is baseline:
+            continue
+        if row[key] >= baseline[key] - tolerance:
+            lines.append(
+                f"{row['codec']}: {baseline['resident_bytes'] / row['resident_bytes']:.1f}x fewer resident "
+                f"bytes than float16 at equal recall ({row[key]} vs {baseline[key]})"
+            )
+        else:
+            lines.append(
+                f"{row['codec']}: recall {row[key]} below float16's {baseline[key]}; "
+                f"raise --rescore-factor / --rescore-min"
+            )
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Recall@k of compressed vector codecs vs exact search")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--snapshot", help="Use the vectors of an existing snapshot")
+    source.add_argument("--synthetic", type=int, default=20000, help="Synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.5)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--codecs", nargs="+", default=["float16", "int8", "pq"])
+    parser.add_argument("--rescore-factor", type=int, default=RESCORE_FACTOR)
+    parser.add_argument("--rescore-min", type=int, default=RESCORE_MIN_CANDIDATES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    if args.snapshot:
+        corpus = snapshot_corpus(args.snapshot)
+        ground_truth = "exact search on the snapshot's float16 vectors (float32 originals are not stored)"
+    else:
+        corpus = synthetic_corpus(args.synthetic, args.dim, args.clusters, args.seed)
+        ground_truth = "exact search on float32 vectors"
+    queries = make_queries(corpus, args.queries, args.noise, args.seed)
+
+    print(f"Corpus: {corpus.shape[0]} x {corpus.shape[1]}, {len(queries)} queries, k={args.k}")
+    print(f"Ground truth: {ground_truth}")
+    rows = run(corpus, queries, args.codecs, args.k, args.rescore_factor, args.rescore_min)
+
+    columns = list(rows[0])
+    print(" | ".join(columns))
+    for row in rows:
+        print(" | ".join(str(row[c]) for c in columns))
+    for line in compare_to_float16(rows, args.k):
+        print(line)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {"corpus": list(corpus.shape), "k": args.k, "ground_truth": ground_truth, "results": rows},
+                f, indent=2
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from itertools import product
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from .prompt import template
+from .vector_db import VectorDB, SearchHit, apply_relevance_cutoff, CHROMA_BATCH_SIZE
+from .document_loader import find_files, multiple_documents_loader
+from .config import (
+    EMBEDDING_MODEL,
+    PARSE_CACHE_DIR,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    TOP_K,
+    RETRIEVAL_MIN_SCORE,
+    RETRIEVAL_MAX_SCORE_DROP,
+    RETRIEVAL_MIN_K,
+    HNSW_SPACE
+)
+
+logger = logging.getLogger(__name__)
+
+'''
+Chunking / retrieval parameter autotuner.
+
+Input is a local evaluation set, one JSON object per line:
+
+    {"question": "How are tides caused?", "expected": "the gravitational pull of the moon", "source": "tides.pdf"}
+
+"expected" is a passage (or a list of passages) an answer needs; "source"
+optionally restricts matches to one file. For every chunk size / overlap
+the corpus is split the way RagLogic splits it, embedded (through an on-disk
+embedding cache) and loaded into an in-memory Chroma collection with the
+configured HNSW parameters. Every top_k and retrieval mode (fixed top_k or
+the adaptive relevance cutoff) is then scored on:
+
+    recall         share of expected passages found in the chunks sent to the LLM
+    mrr            mean reciprocal rank of the first relevant chunk
+    prompt_tokens  approximate prompt size (characters / 4)
+    latency        vector search time per question (p50 / p95)
+
+Documents are parsed through the parse cache, so repeated runs only pay for
+chunking and for embeddings not seen before.
+
+    python -m core.autotune --docs data/ --eval eval.jsonl --chunk-sizes 500 800 1000 --top-k 2 3 5
+'''
+
+# A chunk holding this share of an expected passage (as one run of words) counts as a match
+DEFAULT_MATCH_THRESHOLD = 0.6
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def approx_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+class EmbeddingCache:
+    """Embeddings on disk keyed by model and text, shared by every tuning run."""
+
+    def __init__(self, path: str, model_name: str):
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def embed(self, texts: List[str], embed_fn) -> np.ndarray:
+        """Embed texts, calling embed_fn only for texts not cached yet."""
+        keys = [self._key(t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+            found.update((key, np.frombuffer(blob, dtype=np.float32)) for key, blob in rows)
+
+        missing = list({key: text for key, text in zip(keys, texts) if key not in found}.items())
+        if missing:
+            logger.info(f"  Embedding {len(missing)} new text(s) ({len(texts) - len(missing)} cached)")
+            vectors = np.asarray(embed_fn([text for _, text in missing]), dtype=np.float32)
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for (key, _), vector in zip(missing, vectors)]
+                )
+                self._conn.commit()
+            found.update((key, vector) for (key, _), vector in zip(missing, vectors))
+
+        return np.stack([found[key] for key in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def load_eval_set(path: str) -> List[Dict]:
+    items = []
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            expected = item.get("expected")
+            if not item.get("question") or not expected:
+                raise ValueError(f"{path}:{line_no}: needs 'question' and 'expected'")
+            item["expected"] = [expected] if isinstance(expected, str) else list(expected)
+            items.append(item)
+    return items
+
+
+def is_match(chunk: Document, passage: str, source: Optional[str], threshold: float) -> bool:
+    """True when the chunk contains the passage, or a contiguous run of most of its words."""
+    if source and chunk.metadata.get("filename") != source:
+        return False
+    text, passage = _normalize(chunk.page_content), _normalize(passage)
+    if passage in text:
+        return True
+
+    # Chunk boundaries cut passages: accept the longest run of passage words
+    words, chunk_words = passage.split(), text.split()
+    if not words:
+        return False
+    vocabulary = set(chunk_words)
+    if sum(w in vocabulary for w in words) / len(words) < threshold:
+        return False
+    run = SequenceMatcher(None, words, chunk_words, autojunk=False).find_longest_match(
+        0, len(words), 0, len(chunk_words)
+    )
+    return run.size / len(words) >= threshold
+
+
+def split(documents: List[Document], chunk_size: int, chunk_overlap: int) -> List[Document]:
+    # Same splitter settings as RagLogic
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len
+    )
+    return splitter.split_documents(documents)
+
+
+def evaluate_chunking(
+    chunks: List[Document],
+    chunk_vectors: np.ndarray,
+    eval_set: List[Dict],
+    question_vectors: np.ndarray,
+    top_ks: Iterable[int],
+    modes: Iterable[str],
+    match_threshold: float
+) -> List[Dict]:
+    """Score every top_k / retrieval mode for one chunked corpus."""
+    import chromadb
+
+    client = chromadb.EphemeralClient()
+    name = f"autotune-{os.getpid()}-{threading.get_ident()}"
+    try:
+        client.delete_collection(name)
+    except Exception:
+        pass
+    # Same HNSW parameters and score mapping as the real index
+    collection = client.create_collection(name, metadata=VectorDB._hnsw_metadata())
+    ids = [str(i) for i in range(len(chunks))]
+    for i in range(0, len(ids), CHROMA_BATCH_SIZE):
+        collection.add(
+            ids=ids[i:i + CHROMA_BATCH_SIZE],
+            embeddings=chunk_vectors[i:i + CHROMA_BATCH_SIZE].tolist()
+        )
+
+    # Which chunks match which expected passage, computed once per chunking
+    relevant = [
+        [
+            {j for j, chunk in enumerate(chunks) if is_match(chunk, passage, item.get("source"), match_threshold)}
+            for passage in item["expected"]
+        ]
+        for item in eval_set
+    ]
+
+    rows = []
+    for top_k in top_ks:
+        ranked, latencies = [], []
+        for vector in question_vectors:
+            start = time.perf_counter()
+            result = collection.query(query_embeddings=[vector.tolist()], n_results=min(top_k, len(ids)),
+                                      include=["distances"])
+            latencies.append((time.perf_counter() - start) * 1000)
+            ranked.append([
+                SearchHit(id=chunk_id, score=VectorDB._distance_to_score(distance, HNSW_SPACE))
+                for chunk_id, distance in zip(result["ids"][0], result["distances"][0])
+            ])
+
+        for mode in modes:
+            recalls, reciprocal_ranks, tokens, kept_counts = [], [], [], []
+            for item, hits, passages in zip(eval_set, ranked, relevant):
+                if mode == "adaptive":
+                    hits = apply_relevance_cutoff(hits, RETRIEVAL_MIN_SCORE, RETRIEVAL_MAX_SCORE_DROP, RETRIEVAL_MIN_K)
+                kept = [int(hit.id) for hit in hits]
+                kept_counts.append(len(kept))
+
+                found = [any(j in matches for j in kept) for matches in passages]
+                recalls.append(sum(found) / len(passages))
+                first = next((rank for rank, j in enumerate(kept, 1) if any(j in m for m in passages)), None)
+                reciprocal_ranks.append(1.0 / first if first else 0.0)
+
+                context = "\n\n".join(chunks[j].page_content for j in kept)
+                tokens.append(approx_tokens(template.format(context=context, input=item["question"])))
+
+            rows.append({
+                "top_k": top_k,
+                "mode": mode,
+                "recall": round(float(np.mean(recalls)), 4),
+                "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+                "avg_chunks": round(float(np.mean(kept_counts)), 2),
+                "prompt_tokens": round(float(np.mean(tokens)), 1),
+                "latency_p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "latency_p95_ms": round(float(np.percentile(latencies, 95)), 3)
+            })
+
+    client.delete_collection(name)
+    return rows
+
+
+def recommend(results: List[Dict], recall_tolerance: float) -> Optional[Dict]:
+    """Fewest prompt tokens (then lowest latency) among configs within tolerance of the best recall."""
+    if not results:
+        return None
+    best_recall = max(row["recall"] for row in results)
+    candidates = [row for row in results if row["recall"] >= best_recall - recall_tolerance]
+    return min(candidates, key=lambda row: (row["prompt_tokens"], row["latency_p50_ms"], -row["mrr"]))
+
+
+def autotune(
+    documents: List[Document],
+    eval_set: List[Dict],
+    embeddings,
+    chunk_sizes: List[int],
+    chunk_overlaps: List[int],
+    top_ks: List[int],
+    modes: List[str],
+    embedding_cache: EmbeddingCache,
+    match_threshold: float = DEFAULT_MATCH_THRESHOLD,
+    recall_tolerance: float = 0.02
+) -> Dict:
+    question_vectors = embedding_cache.embed(
+        [item["question"] for item in eval_set], lambda texts: [embeddings.embed_query(t) for t in texts]
+    )
+
+    results = []
+    for chunk_size, chunk_overlap in product(chunk_sizes, chunk_overlaps):
+        if chunk_overlap >= chunk_size:
+            continue
+        logger.info(f"Chunking: size={chunk_size}, overlap={chunk_overlap}")
+        chunks = split(documents, chunk_size, chunk_overlap)
+        if not chunks:
+            continue
+        chunk_vectors = embedding_cache.embed([c.page_content for c in chunks], embeddings.embed_documents)
+
+        for row in evaluate_chunking(chunks, chunk_vectors, eval_set, question_vectors, top_ks, modes, match_threshold):
+            results.append({"chunk_size": chunk_size, "chunk_overlap": chunk_overlap, "chunks": len(chunks), **row})
+
+    best = recommend(results, recall_tolerance)
+    report = {
+        "questions": len(eval_set),
+        "current": {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP, "top_k": TOP_K},
+        "results": results,
+        "recommended": best
+    }
+    if best:
+        report["recommended_env"] = {
+            "CHUNK_SIZE": best["chunk_size"],
+            "CHUNK_OVERLAP": best["chunk_overlap"],
+            "TOP_K": best["top_k"],
+            "ADAPTIVE_RETRIEVAL": "true" if best["mode"] == "adaptive" else "false"
+        }
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Sweep chunking and retrieval settings against an evaluation set")
+    parser.add_argument("--docs", nargs="+", required=True, help="Corpus files or directories")
+    parser.add_argument("--eval", required=True, help="JSONL with question / expected [/ source]")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[500, 800, 1000, 1500])
+    parser.add_argument("--chunk-overlaps", type=int, nargs="+", default=[0, 100, 200])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[2, 3, 4, 6])
+    parser.add_argument("--modes", nargs="+", default=["fixed", "adaptive"], choices=["fixed", "adaptive"])
+    parser.add_argument("--match-threshold", type=float, default=DEFAULT_MATCH_THRESHOLD,
+                        help="Share of an expected passage a chunk must hold as one run of words")
+    parser.add_argument("--recall-tolerance", type=float, default=0.02,
+                        help="Recall the recommendation may give up for fewer tokens")
+    parser.add_argument("--embedding-cache", default=os.path.join(PARSE_CACHE_DIR, "embeddings.sqlite"))
+    parser.add_argument("--json", help="Also write the full report to this file")
+    args = parser.parse_args(argv)
+
+    from .rag_logic import RagLogic
+
+    files = []
+    for path in args.docs:
+        files.extend(find_files(path) if os.path.isdir(path) else [os.path.abspath(path)])
+    documents = multiple_documents_loader(files)
+    eval_set = load_eval_set(args.eval)
+    if not documents or not eval_set:
+        raise SystemExit("Need at least one document and one evaluation question")
+
+    cache = EmbeddingCache(args.embedding_cache, EMBEDDING_MODEL)
+    try:
+        report = autotune(
+            documents,
+            eval_set,
+            RagLogic().get_embedding_model(),
+            args.chunk_sizes,
+            args.chunk_overlaps,
+            args.top_k,
+            args.modes,
+            cache,
+            match_threshold=args.match_threshold,
+            recall_tolerance=args.recall_tolerance
+        )
+    finally:
+        cache.close()
+
+    columns = ["chunk_size", "chunk_overlap", "chunks", "top_k", "mode", "recall", "mrr",
+               "avg_chunks", "prompt_tokens", "latency_p50_ms", "latency_p95_ms"]
+    print(" | ".join(columns))
+    for row in report["results"]:
+        print(" | ".join(str(row[c]) for c in columns))
+    print("\nRecommended:")
+    print(json.dumps(report.get("recommended_env"), indent=2))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import os
+import zlib
+import sqlite3
+import logging
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+'''
+Compressed chunk-text store.
+
+The vector index only keeps embeddings and compact metadata; the chunk text
+lives here, zlib compressed and keyed by chunk id, and is read back only for
+the chunks that are actually needed (prompt context, opened sources).
+'''
+class ChunkStore:
+
+    def __init__(self, path: str, compression_level: int = 6):
+        self.path = path
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # One shared connection, serialized by the lock (Streamlit and the
+        # shard thread pool both call in from different threads)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, text BLOB NOT NULL)"
+            )
+            self._conn.commit()
+        logger.info(f"✓ Chunk store ready: {path}")
+
+    def _compress(self, text: str) -> bytes:
+        return zlib.compress(text.encode("utf-8"), self.compression_level)
+
+    @staticmethod
+    def _decompress(blob: bytes) -> str:
+        return zlib.decompress(blob).decode("utf-8")
+
+    def put_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        """Store (id, text) pairs, replacing existing ids."""
+        rows = [(chunk_id, self._compress(text)) for chunk_id, text in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO chunks (id, text) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def get_many(self, ids: List[str]) -> Dict[str, str]:
+        """Return {id: text} for the ids that are present."""
+        if not ids:
+            return {}
+        texts = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, text FROM chunks WHERE id IN ({placeholders})", batch
+                ).fetchall()
+            for chunk_id, blob in rows:
+                texts[chunk_id] = self._decompress(blob)
+        return texts
+
+    def get(self, chunk_id: str) -> str:
+        return self.get_many([chunk_id]).get(chunk_id, "")
+
+    def delete_many(self, ids: List[str]) -> None:
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", batch)
+                self._conn.commit()
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT id FROM chunks")]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+        self.vacuum()
+
+    def vacuum(self) -> None:
+        """Give the space of deleted chunks back to the file system."""
+        with self._lock:
+            self._conn.execute("VACUUM")
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def size_bytes(self) -> int:
+        """Compressed payload size (excluding SQLite page overhead)."""
+        with self._lock:
+            total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(text)), 0) FROM chunks").fetchone()[0]
+        return int(total)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -2,8 +2,21 @@ import os
 import streamlit as st
 from dotenv import load_dotenv
 
+def _get_secret(key: str):
+    # st.secrets raises when no secrets.toml exists (e.g. CLI tools)
+    try:
+        return st.secrets.get(key)
+    except Exception:
+        return None
+
+def _has_secrets() -> bool:
+    try:
+        return bool(st.secrets)
+    except Exception:
+        return False
+
 # Load .env only in local dev
-if not st.secrets:
+if not _has_secrets():
     load_dotenv()
 
 def get_config(key: str, default: str = None) -> str:
@@ -11,7 +24,7 @@ def get_config(key: str, default: str = None) -> str:
 
 # --- API KEYS ---
 def get_groq_api_key():
-    return st.secrets.get("GROQ_API_KEY") or os.getenv("GROQ_API_KEY")
+    return _get_secret("GROQ_API_KEY") or os.getenv("GROQ_API_KEY")
 
 HUGGINGFACE_API_KEY = get_config("HUGGINGFACE_API_KEY")
 
@@ -22,25 +35,129 @@ EMBEDDING_MODEL = get_config(
 )
 
 LLM_PROVIDER = get_config("LLM_PROVIDER", "groq")
-LLM_MODEL = get_config("LLM_MODEL", "llama-3.1-8b-instant")
+# Default model of each provider; LLM_MODEL overrides it for the primary provider
+GROQ_MODEL = get_config("GROQ_MODEL", "llama-3.1-8b-instant")
+HUGGINGFACE_MODEL = get_config("HUGGINGFACE_MODEL", "meta-llama/Llama-3.1-8B-Instruct")
+LLM_MODEL = get_config(
+    "LLM_MODEL",
+    {"groq": GROQ_MODEL, "huggingface": HUGGINGFACE_MODEL, "stub": "stub"}.get(LLM_PROVIDER, "")
+)
 LLM_TEMPERATURE = float(get_config("LLM_TEMPERATURE", 0.7))
+# Whole-request budget for one LLM call, in seconds
+LLM_TIMEOUT = float(get_config("LLM_TIMEOUT", 30))
+LLM_MAX_CONNECTIONS = int(get_config("LLM_MAX_CONNECTIONS", 20))
+# Optional hedging: send to the backup if the primary has no token after LLM_HEDGE_AFTER_MS
+LLM_BACKUP_PROVIDER = get_config("LLM_BACKUP_PROVIDER", "")
+LLM_BACKUP_MODEL = get_config("LLM_BACKUP_MODEL", "")
+LLM_HEDGE_AFTER_MS = float(get_config("LLM_HEDGE_AFTER_MS", 1500))
+# Threads running hedged streams; a hedged request holds up to two (primary
+# and backup), so keep this at least twice the expected concurrent requests
+LLM_HEDGE_WORKERS = int(get_config("LLM_HEDGE_WORKERS", 2 * LLM_MAX_CONNECTIONS))
 
 # --- PATHS ---
 PERSIST_DIRECTORY = get_config("PERSIST_DIRECTORY", "./chroma_db")
 PDF_PATH = get_config("PDF_PATH", "./data/pdfs")
 
+# --- DOCUMENT PROCESSING ---
+CHUNK_SIZE = int(get_config("CHUNK_SIZE", 1000))
+CHUNK_OVERLAP = int(get_config("CHUNK_OVERLAP", 200))
+# Parsed documents are cached per file content, so re-chunking and
+# re-indexing skip the parser for files it has already seen
+PARSE_CACHE = get_config("PARSE_CACHE", "true").lower() in ("1", "true", "yes")
+PARSE_CACHE_DIR = get_config("PARSE_CACHE_DIR", "./parse_cache")
+# Loader chain per file extension: "ext|ext=loader,fallback;...", "*" for everything else.
+# Loaders: text, pypdf (embedded text layer), unstructured[:fast|hi_res|ocr_only|auto]
+PARSE_STRATEGIES = get_config("PARSE_STRATEGIES", "txt|md=text;pdf=pypdf,unstructured;*=unstructured")
+# PDFs whose text layer is thinner than this on most pages are treated as scanned
+PDF_MIN_CHARS_PER_PAGE = int(get_config("PDF_MIN_CHARS_PER_PAGE", 100))
+
+# --- VECTOR STORE / SHARDING ---
+COLLECTION_NAME = get_config("COLLECTION_NAME", "example_collection")
+# Comma separated shard names (e.g. per tenant or document group).
+# When empty, SHARD_COUNT hash shards named shard_0..shard_N are used.
+SHARD_NAMES = [s.strip() for s in get_config("SHARD_NAMES", "").split(",") if s.strip()]
+SHARD_COUNT = int(get_config("SHARD_COUNT", 1))
+# Metadata key used to route chunks to a shard
+SHARD_KEY = get_config("SHARD_KEY", "source")
+SEARCH_WORKERS = int(get_config("SEARCH_WORKERS", 4))
+
+# --- HNSW INDEX ---
+# Applied when a collection is created or rebuilt (python -m core.index_maintenance rebuild)
+HNSW_SPACE = get_config("HNSW_SPACE", "l2")  # l2, cosine or ip
+HNSW_CONSTRUCTION_EF = int(get_config("HNSW_CONSTRUCTION_EF", 100))
+HNSW_M = int(get_config("HNSW_M", 16))
+# Search-time ef (higher = better recall, slower). 0 keeps each collection's own value
+HNSW_SEARCH_EF = int(get_config("HNSW_SEARCH_EF", 0))
+
+# --- RETRIEVAL ---
+# Chunks retrieved per question by RagSystem callers that don't pass top_k
+# (the app always passes its slider value)
+TOP_K = int(get_config("TOP_K", 3))
+# Adaptive top-k (opt-in): top_k is an upper bound; hits below the similarity
+# floor or after a sharp score drop are not sent to the LLM
+ADAPTIVE_RETRIEVAL = get_config("ADAPTIVE_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+RETRIEVAL_MIN_SCORE = float(get_config("RETRIEVAL_MIN_SCORE", 0.25))
+RETRIEVAL_MAX_SCORE_DROP = float(get_config("RETRIEVAL_MAX_SCORE_DROP", 0.15))
+RETRIEVAL_MIN_K = int(get_config("RETRIEVAL_MIN_K", 1))
+
+# --- SNAPSHOTS ---
+# Path to a prebuilt index snapshot; when set the app serves it read-only
+INDEX_SNAPSHOT = get_config("INDEX_SNAPSHOT", "")
+
+# Compressed vector codes written into snapshots: float16, int8 or pq.
+# Candidates are scanned on the codes and re-scored on float16 vectors.
+VECTOR_CODEC = get_config("VECTOR_CODEC", "float16")
+PQ_SUBVECTORS = int(get_config("PQ_SUBVECTORS", 48))
+RESCORE_FACTOR = int(get_config("RESCORE_FACTOR", 8))
+RESCORE_MIN_CANDIDATES = int(get_config("RESCORE_MIN_CANDIDATES", 64))
+
+# --- READ-ONLY REPLICAS ---
+# Replicas serve published index versions and hot-swap to newer ones
+READ_ONLY = get_config("READ_ONLY", "false").lower() in ("1", "true", "yes")
+# Empty: "versions" inside the persist directory of the index being published/served
+INDEX_VERSIONS_DIR = get_config("INDEX_VERSIONS_DIR", "")
+INDEX_RELOAD_INTERVAL = float(get_config("INDEX_RELOAD_INTERVAL", 10))
+INDEX_KEEP_VERSIONS = int(get_config("INDEX_KEEP_VERSIONS", 3))
+# Ingestion side: publish a new version after uploads, in the background once
+# no new upload has arrived for INDEX_PUBLISH_DELAY seconds (one export per batch)
+INDEX_AUTO_PUBLISH = get_config("INDEX_AUTO_PUBLISH", "false").lower() in ("1", "true", "yes")
+INDEX_PUBLISH_DELAY = float(get_config("INDEX_PUBLISH_DELAY", 5))
+
+# --- PROFILING ---
+# Opt-in: profile this fraction of requests and/or every request slower than PROFILE_SLOW_MS
+PROFILE_SAMPLE_RATE = float(get_config("PROFILE_SAMPLE_RATE", 0))
+PROFILE_SLOW_MS = float(get_config("PROFILE_SLOW_MS", 0))
+PROFILE_DIR = get_config("PROFILE_DIR", "./profiles")
+PROFILE_MAX_FILES = int(get_config("PROFILE_MAX_FILES", 200))
+PROFILE_INTERVAL_MS = float(get_config("PROFILE_INTERVAL_MS", 5))
+
 def validate_config():
     errors = []
 
-    if LLM_PROVIDER == "groq" and not get_groq_api_key():
+    providers = [LLM_PROVIDER] + ([LLM_BACKUP_PROVIDER] if LLM_BACKUP_PROVIDER else [])
+
+    if "groq" in providers and not get_groq_api_key():
         errors.append("GROQ_API_KEY is required for Groq provider")
 
-    if LLM_PROVIDER == "huggingface" and not HUGGINGFACE_API_KEY:
+    if "huggingface" in providers and not HUGGINGFACE_API_KEY:
         errors.append("HUGGINGFACE_API_KEY is required")
 
     if not LLM_PROVIDER:
         errors.append("LLM_PROVIDER must be set")
 
+    for provider in providers:
+        if provider and provider not in ("groq", "huggingface", "stub"):
+            errors.append(f"Unknown LLM provider: {provider}")
+
+    if LLM_TIMEOUT <= 0:
+        errors.append("LLM_TIMEOUT must be positive")
+
+    if SHARD_COUNT < 1:
+        errors.append("SHARD_COUNT must be at least 1")
+
+    if HNSW_SPACE not in ("l2", "cosine", "ip"):
+        errors.append(f"Unknown HNSW_SPACE: {HNSW_SPACE} (expected l2, cosine or ip)")
+
     if errors:
         raise ValueError(
             "Configuration errors:\n" +
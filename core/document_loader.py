@@ -1,17 +1,202 @@
 import os
-from typing import List
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
+from importlib.metadata import version, PackageNotFoundError
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.documents import Document
-from langchain_unstructured import UnstructuredLoader 
-from langchain_community.document_loaders import DirectoryLoader
+from .parse_cache import parse_cache, file_digest
+from .config import PARSE_STRATEGIES, PDF_MIN_CHARS_PER_PAGE
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+'''
+Loader registry.
+
+Each file type gets a chain of loaders (PARSE_STRATEGIES). The first loader
+that accepts the file wins; a loader returns None to hand the file to the
+next one (e.g. a PDF without a usable text layer goes from pypdf to
+Unstructured); cacheable loaders remember that answer too, so a scanned
+PDF is not run through pypdf again on every load. Slow loaders are cached in the parse cache under a tag
+naming the loader, its option, the mode and the library version. Every
+document records the content digest and that tag, so the index can find
+its parsed text again (reindex) without the original file.
+
+- text:         read the file directly
+- pypdf:        embedded text layer of digital-born PDFs, one document per page
+- unstructured: Unstructured partitioning; ":fast", ":hi_res", ":ocr_only" or
+                ":auto" (default) picks its strategy for scanned or complex layouts
+'''
+
+
+# Metadata naming the parsed content and the parser that produced it
+DIGEST_KEY = "content_digest"
+PARSER_KEY = "parser"
+
+
+def _package_version(name: str) -> str:
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return "unknown"
+
+
+class FileLoader(ABC):
+    name = "base"
+    # Only worth caching when parsing costs more than reading the cache entry
+    cacheable = True
+
+    @property
+    def version(self) -> str:
+        return "0"
+
+    @abstractmethod
+    def load(self, file_path: str, mode: str, option: Optional[str] = None) -> Optional[List[Document]]:
+        """Parse the file, or return None to fall through to the next loader."""
+
+
+class TextFileLoader(FileLoader):
+    name = "text"
+    cacheable = False
+
+    def load(self, file_path: str, mode: str, option: Optional[str] = None) -> Optional[List[Document]]:
+        with open(file_path, "r", encoding=option or "utf-8", errors="replace") as f:
+            text = f.read()
+        if mode == "elements":
+            return [Document(page_content=p.strip()) for p in re.split(r"\n\s*\n", text) if p.strip()]
+        return [Document(page_content=text)]
+
+
+class PdfTextLoader(FileLoader):
+    name = "pypdf"
+    # Share of pages allowed below PDF_MIN_CHARS_PER_PAGE before the PDF counts as scanned
+    MAX_THIN_PAGE_RATIO = 0.2
+
+    @property
+    def version(self) -> str:
+        return _package_version("pypdf")
+
+    def load(self, file_path: str, mode: str, option: Optional[str] = None) -> Optional[List[Document]]:
+        from pypdf import PdfReader
+
+        reader = PdfReader(file_path)
+        pages = [page.extract_text() or "" for page in reader.pages]
+        if not pages:
+            return None
+
+        thin = sum(len(text.strip()) < PDF_MIN_CHARS_PER_PAGE for text in pages)
+        if thin / len(pages) > self.MAX_THIN_PAGE_RATIO:
+            logger.info(f"  {os.path.basename(file_path)}: {thin}/{len(pages)} pages without a text layer")
+            return None
+
+        # One document per page keeps page numbers for sources
+        return [
+            Document(page_content=text, metadata={"page_number": i + 1})
+            for i, text in enumerate(pages) if text.strip()
+        ]
+
+
+class UnstructuredFileLoader(FileLoader):
+    name = "unstructured"
+
+    @property
+    def version(self) -> str:
+        return _package_version("unstructured")
+
+    def load(self, file_path: str, mode: str, option: Optional[str] = None) -> Optional[List[Document]]:
+        from langchain_unstructured import UnstructuredLoader
+
+        kwargs = {"strategy": option} if option else {}
+        return UnstructuredLoader(file_path=file_path, mode=mode, **kwargs).load()
+
+
+_LOADERS: Dict[str, FileLoader] = {}
+
+
+def register_loader(loader: FileLoader) -> None:
+    """Make a loader available to PARSE_STRATEGIES by its name."""
+    _LOADERS[loader.name] = loader
+
+
+for _loader in (TextFileLoader(), PdfTextLoader(), UnstructuredFileLoader()):
+    register_loader(_loader)
+
+
+def parse_strategies(spec: str) -> Dict[str, List[Tuple[str, Optional[str]]]]:
+    """Parse a PARSE_STRATEGIES spec such as "txt|md=text;pdf=pypdf,unstructured:hi_res"."""
+    strategies = {}
+    for entry in filter(None, (e.strip() for e in spec.split(";"))):
+        extensions, _, chain = entry.partition("=")
+        steps = []
+        for step in filter(None, (s.strip() for s in chain.split(","))):
+            name, _, option = step.partition(":")
+            steps.append((name, option or None))
+        for ext in extensions.split("|"):
+            strategies[ext.strip().lower().lstrip(".")] = steps
+    return strategies
+
+
+STRATEGIES = parse_strategies(PARSE_STRATEGIES)
+
+
+def strategy_for(file_path: str) -> List[Tuple[str, Optional[str]]]:
+    """Loader chain for a file; unstructured (its default strategy) when nothing is configured."""
+    ext = os.path.splitext(file_path)[1].lower().lstrip(".")
+    return STRATEGIES.get(ext) or STRATEGIES.get("*") or [(UnstructuredFileLoader.name, None)]
+
+
+def _parser_tag(loader: FileLoader, option: Optional[str], mode: str) -> str:
+    return f"{loader.name}{'-' + option if option else ''}-{mode}-{loader.version}"
+
+
+def _tag_documents(documents: List[Document], digest: str, tag: str) -> List[Document]:
+    for doc in documents:
+        doc.metadata[DIGEST_KEY] = digest
+        doc.metadata[PARSER_KEY] = tag
+    return documents
+
+
+def _parse(file_path: str, mode: str) -> Tuple[List[Document], str]:
+    """Run the loader chain for one file. Returns (documents, description of the loader used)."""
+    digest = file_digest(file_path)
+    for name, option in strategy_for(file_path):
+        loader = _LOADERS.get(name)
+        if loader is None:
+            logger.warning(f"Unknown loader '{name}' in PARSE_STRATEGIES")
+            continue
+
+        tag = _parser_tag(loader, option, mode)
+        if loader.cacheable:
+            # Same content parsed (or declined) the same way before: skip the parser
+            if parse_cache.is_declined(digest, tag):
+                continue
+            documents = parse_cache.get(digest, tag, file_path)
+            if documents is not None:
+                return _tag_documents(documents, digest, tag), f"{tag}, parse cache"
+
+        try:
+            documents = loader.load(file_path, mode, option)
+        except Exception as e:
+            logger.warning(f"  {name} could not load {os.path.basename(file_path)}: {e}")
+            continue
+        if documents is None:
+            if loader.cacheable:
+                parse_cache.put_declined(digest, tag)
+            continue
+
+        if loader.cacheable:
+            parse_cache.put(digest, tag, documents)
+        return _tag_documents(documents, digest, tag), tag
+
+    raise ValueError("no configured loader could parse the file")
+
+
 def document_loader(file_path: str, mode: str = "single") -> List[Document]:
-    """Load a single document file using Unstructured."""
+    """Load a single document file with the loader chain for its type."""
     
     if not os.path.exists(file_path):
         logger.error(f"File not found: {file_path}")
@@ -21,18 +206,14 @@ def document_loader(file_path: str, mode: str = "single") -> List[Document]:
     filename = os.path.basename(file_path)
     
     try:
-        loader = UnstructuredLoader(
-            file_path=file_path,
-            mode=mode
-        )
-        documents = loader.load()
+        documents, used = _parse(file_path, mode)
         
         # Add custom metadata
         for doc in documents:
             doc.metadata["source"] = file_path
             doc.metadata["filename"] = filename
         
-        logger.info(f"✓ Loaded {len(documents)} from {filename}")
+        logger.info(f"✓ Loaded {len(documents)} from {filename} ({used})")
         return documents
         
     except Exception as e:
@@ -40,6 +221,20 @@ def document_loader(file_path: str, mode: str = "single") -> List[Document]:
         return []
 
 
+def load_parsed(file_path: str, digest: str, parser_tag: str) -> Optional[List[Document]]:
+    """A file's documents from the parse cache, as document_loader returns them; None on a miss.
+
+    The file itself does not have to exist any more.
+    """
+    documents = parse_cache.get(digest, parser_tag, file_path)
+    if documents is None:
+        return None
+    for doc in _tag_documents(documents, digest, parser_tag):
+        doc.metadata["source"] = file_path
+        doc.metadata["filename"] = os.path.basename(file_path)
+    return documents
+
+
 def multiple_documents_loader(file_paths: List[str], mode: str = "single") -> List[Document]:
     """Load multiple documents."""
     
@@ -55,36 +250,45 @@ def multiple_documents_loader(file_paths: List[str], mode: str = "single") -> Li
     return all_documents
 
 
+def _expand_braces(pattern: str) -> List[str]:
+    # pathlib's glob has no {a,b} alternatives: "**/*.{pdf,txt}" -> ["**/*.pdf", "**/*.txt"]
+    match = re.search(r"\{([^{}]*)\}", pattern)
+    if not match:
+        return [pattern]
+    head, tail = pattern[:match.start()], pattern[match.end():]
+    # Nested groups expand innermost first and repeat the outer options
+    expanded = (p for option in match.group(1).split(",") for p in _expand_braces(head + option + tail))
+    return list(dict.fromkeys(expanded))
+
+
+def find_files(directory_path: str, glob_pattern: str = "**/*.{pdf,docx,doc,txt}") -> List[str]:
+    """Files under directory_path matching glob_pattern (brace alternatives allowed)."""
+    files = set()
+    for pattern in _expand_braces(glob_pattern):
+        files.update(str(p.resolve()) for p in Path(directory_path).glob(pattern) if p.is_file())
+    return sorted(files)
+
+
 def load_from_directory(
     directory_path: str,
     glob_pattern: str = "**/*",
-    mode: str = "single"
+    mode: str = "single",
+    max_workers: int = 4
 ) -> List[Document]:
     """Load all documents from a directory."""
     
-    from langchain_community.document_loaders import DirectoryLoader
-    
     if not os.path.exists(directory_path):
         logger.error(f"Directory not found: {directory_path}")
         return []
     
     try:
-        loader = DirectoryLoader(
-            path=directory_path,
-            glob=glob_pattern,
-            loader_cls=UnstructuredLoader,
-            loader_kwargs={"mode": mode},
-            show_progress=True,
-            use_multithreading=True,
-            silent_errors=True 
-        )
-        
-        documents = loader.load()
-        
-        # Add filename metadata
-        for doc in documents:
-            if "source" in doc.metadata:
-                doc.metadata["filename"] = os.path.basename(doc.metadata["source"])
+        file_paths = find_files(directory_path, glob_pattern)
+        logger.info(f"Loading {len(file_paths)} file(s) from {directory_path}...")
+
+        # Per-file loading goes through the parse cache; unreadable files load as []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(lambda fp: document_loader(fp, mode=mode), file_paths)
+            documents = [doc for docs in results for doc in docs]
         
         logger.info(f"✓ Loaded {len(documents)} documents from directory")
         return documents
@@ -0,0 +1,257 @@
+import os
+import re
+import json
+import shutil
+import sqlite3
+import time
+import logging
+import argparse
+from typing import Dict, List, Optional
+import numpy as np
+from .rag_logic import RagLogic
+from .vector_db import VectorDB, _iter_collection
+from .parse_cache import parse_cache
+from .config import PERSIST_DIRECTORY, CHUNK_SIZE, CHUNK_OVERLAP
+
+logger = logging.getLogger(__name__)
+
+'''
+Offline index maintenance. Run with the app stopped:
+
+    python -m core.index_maintenance reindex --chunk-size 800 --chunk-overlap 100
+    python -m core.index_maintenance rebuild
+    python -m core.index_maintenance tune-ef --values 10 20 50 100 200 --target-recall 0.95
+
+reindex: re-chunk and re-embed every indexed file with new chunking
+settings. Parsed text comes from the parse cache entry recorded at ingest,
+else from the chunk store, so files removed since (app uploads) are kept
+and nothing is parsed again. The new index is built next to the live one
+and swapped in once complete.
+
+rebuild: copy every collection into a fresh one built with the configured
+HNSW parameters (HNSW_SPACE, HNSW_CONSTRUCTION_EF, HNSW_M). This drops dead
+entries left by deletes and re-ingests. Chunk texts no vector points to are
+removed. Size and query latency are reported before and after.
+
+tune-ef: recall@k against exact search and latency for a range of search
+ef values; --apply sets one on the collections.
+'''
+
+# Published versions and imported snapshots are not part of the live index
+_NOT_INDEX_DIRS = ("versions", "snapshots")
+
+
+def index_size_bytes(persist_directory: str) -> int:
+    """Bytes on disk of the live index (Chroma files + chunk store)."""
+    total = 0
+    for root, dirs, files in os.walk(persist_directory):
+        if root == persist_directory:
+            dirs[:] = [d for d in dirs if d not in _NOT_INDEX_DIRS]
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def sample_queries(vector_db: VectorDB, count: int, seed: int = 0) -> np.ndarray:
+    """Stored embeddings, slightly perturbed, used as realistic query vectors."""
+    rng = np.random.default_rng(seed)
+    vectors = []
+    for store in vector_db.shards.values():
+        total = store._collection.count()
+        for offset in rng.integers(0, max(total, 1), size=min(count, total)):
+            page = store._collection.get(include=["embeddings"], limit=1, offset=int(offset))
+            vectors.extend(page["embeddings"])
+    if not vectors:
+        return np.zeros((0, 0), dtype=np.float32)
+    queries = np.asarray(vectors, dtype=np.float32)[rng.permutation(len(vectors))[:count]]
+    queries += 0.05 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(queries.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def measure_latency(vector_db: VectorDB, queries: np.ndarray, top_k: int = 10) -> Dict:
+    """Per-query latency of the vector search alone (no embedding, no hydration)."""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        for shard in vector_db.shard_names:
+            vector_db._search_shard(shard, query.tolist(), top_k, None)
+        latencies.append((time.perf_counter() - start) * 1000)
+    if not latencies:
+        return {"queries": 0}
+    return {
+        "queries": len(latencies),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3)
+    }
+
+
+def _index_report(vector_db: VectorDB, queries: np.ndarray, top_k: int) -> Dict:
+    stats = vector_db.get_stats()
+    return {
+        "bytes": index_size_bytes(vector_db.persist_directory),
+        "chunks": stats["total_chunks"],
+        "chunk_texts": vector_db.chunk_store.count(),
+        "hnsw": vector_db.hnsw_config(),
+        "latency": measure_latency(vector_db, queries, top_k)
+    }
+
+
+_SEGMENT_DIR = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+def reclaim_chroma_space(persist_directory: str) -> Dict:
+    """Free what Chroma leaves behind after dropping collections.
+
+    Deleted collections keep their HNSW segment directories and free SQLite
+    pages on disk; remove directories no segment refers to and VACUUM.
+    """
+    db_path = os.path.join(persist_directory, "chroma.sqlite3")
+    removed = []
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            live = {row[0] for row in conn.execute("SELECT id FROM segments")}
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        for name in os.listdir(persist_directory):
+            path = os.path.join(persist_directory, name)
+            if _SEGMENT_DIR.match(name) and os.path.isdir(path) and name not in live:
+                shutil.rmtree(path)
+                removed.append(name)
+    except Exception as e:
+        logger.warning(f"Could not reclaim Chroma disk space: {e}")
+    return {"segment_dirs_removed": len(removed)}
+
+
+def rebuild(persist_directory: str = PERSIST_DIRECTORY, shards: Optional[List[str]] = None,
+            queries: int = 200, top_k: int = 10) -> Dict:
+    vector_db = VectorDB(rag_logic=RagLogic(), persist_directory=persist_directory)
+    sample = sample_queries(vector_db, queries)
+    before = _index_report(vector_db, sample, top_k)
+
+    start = time.perf_counter()
+    result = vector_db.rebuild(shards)
+    result.update(reclaim_chroma_space(persist_directory))
+    elapsed = time.perf_counter() - start
+
+    after = _index_report(vector_db, sample, top_k)
+    return {"before": before, "after": after, "rebuild": result, "seconds": round(elapsed, 1)}
+
+
+def _exact_top_k(vector_db: VectorDB, queries: np.ndarray, top_k: int) -> List[set]:
+    # Brute force over every stored vector (offline, so memory is not a concern)
+    ids, vectors = [], []
+    for store in vector_db.shards.values():
+        for page in _iter_collection(store._collection, ["embeddings"]):
+            ids.extend(page["ids"])
+            vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+    matrix = np.concatenate(vectors)
+    truth = []
+    for query in queries:
+        scores = matrix @ query
+        top = np.argpartition(-scores, min(top_k, len(scores)) - 1)[:top_k]
+        truth.append({ids[i] for i in top})
+    return truth
+
+
+def tune_search_ef(persist_directory: str = PERSIST_DIRECTORY, values: Optional[List[int]] = None,
+                   queries: int = 200, top_k: int = 10, target_recall: float = 0.95) -> Dict:
+    vector_db = VectorDB(rag_logic=RagLogic(), persist_directory=persist_directory)
+    sample = sample_queries(vector_db, queries)
+    truth = _exact_top_k(vector_db, sample, top_k)
+    original = {shard: h["search_ef"] for shard, h in vector_db.hnsw_config().items()}
+
+    rows = []
+    try:
+        for ef in values or [10, 20, 50, 100, 200]:
+            if not vector_db.set_search_ef(ef):
+                break
+            recalls = []
+            for query, expected in zip(sample, truth):
+                found = {
+                    hit.id for shard in vector_db.shard_names
+                    for hit in vector_db._search_shard(shard, query.tolist(), top_k, None)
+                }
+                recalls.append(len(found & expected) / max(len(expected), 1))
+            rows.append({
+                "search_ef": ef,
+                f"recall@{top_k}": round(float(np.mean(recalls)), 4),
+                **measure_latency(vector_db, sample, top_k)
+            })
+    finally:
+        # Leave the collections as they were; --apply sets the chosen value
+        for shard, ef in original.items():
+            if ef:
+                vector_db.set_search_ef(ef, [shard])
+
+    good = [row for row in rows if row[f"recall@{top_k}"] >= target_recall]
+    recommended = min(good, key=lambda row: row["search_ef"])["search_ef"] if good else None
+    return {"results": rows, "target_recall": target_recall, "recommended_search_ef": recommended}
+
+
+def reindex(persist_directory: str = PERSIST_DIRECTORY, chunk_size: int = CHUNK_SIZE,
+            chunk_overlap: int = CHUNK_OVERLAP) -> Dict:
+    rag_logic = RagLogic(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    vector_db = VectorDB(rag_logic=rag_logic, persist_directory=persist_directory)
+    before = vector_db.get_stats()
+    cache_before = parse_cache.stats()["entries"]
+
+    start = time.perf_counter()
+    success = vector_db.reindex()
+    elapsed = time.perf_counter() - start
+
+    after = vector_db.get_stats()
+    return {
+        "success": success,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "files": after["total_files"],
+        "chunks_before": before["total_chunks"],
+        "chunks_after": after["total_chunks"],
+        "newly_parsed_files": parse_cache.stats()["entries"] - cache_before,
+        "seconds": round(elapsed, 1)
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Offline index maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    reindex_parser = sub.add_parser("reindex", help="Re-chunk and re-embed all indexed files")
+    reindex_parser.add_argument("--persist-directory", default=PERSIST_DIRECTORY)
+    reindex_parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    reindex_parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP)
+
+    rebuild_parser = sub.add_parser("rebuild", help="Compact: rewrite collections with the configured HNSW parameters")
+    rebuild_parser.add_argument("--persist-directory", default=PERSIST_DIRECTORY)
+    rebuild_parser.add_argument("--shards", nargs="+", help="Only these shards (default: all)")
+    rebuild_parser.add_argument("--queries", type=int, default=200, help="Queries for the latency comparison")
+    rebuild_parser.add_argument("--top-k", type=int, default=10)
+
+    tune_parser = sub.add_parser("tune-ef", help="Recall and latency for a range of search ef values")
+    tune_parser.add_argument("--persist-directory", default=PERSIST_DIRECTORY)
+    tune_parser.add_argument("--values", type=int, nargs="+", default=[10, 20, 50, 100, 200])
+    tune_parser.add_argument("--queries", type=int, default=200)
+    tune_parser.add_argument("--top-k", type=int, default=10)
+    tune_parser.add_argument("--target-recall", type=float, default=0.95)
+    tune_parser.add_argument("--apply", type=int, help="Set this search ef on the collections afterwards")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "reindex":
+        info = reindex(args.persist_directory, args.chunk_size, args.chunk_overlap)
+        print(json.dumps(info, indent=2))
+    elif args.command == "rebuild":
+        info = rebuild(args.persist_directory, args.shards, args.queries, args.top_k)
+        print(json.dumps(info, indent=2))
+    elif args.command == "tune-ef":
+        info = tune_search_ef(args.persist_directory, args.values, args.queries, args.top_k, args.target_recall)
+        print(json.dumps(info, indent=2))
+        if args.apply:
+            vector_db = VectorDB(rag_logic=RagLogic(), persist_directory=args.persist_directory)
+            vector_db.set_search_ef(args.apply)
+            print(f"Applied search ef {args.apply}; set HNSW_SEARCH_EF={args.apply} to keep it in config")
+
+
+if __name__ == "__main__":
+    main()
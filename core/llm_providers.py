@@ -0,0 +1,362 @@
+import time
+import queue
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from .config import (
+    LLM_PROVIDER,
+    LLM_MODEL,
+    GROQ_MODEL,
+    HUGGINGFACE_MODEL,
+    LLM_TEMPERATURE,
+    LLM_TIMEOUT,
+    LLM_MAX_CONNECTIONS,
+    LLM_BACKUP_PROVIDER,
+    LLM_BACKUP_MODEL,
+    LLM_HEDGE_AFTER_MS,
+    LLM_HEDGE_WORKERS,
+    HUGGINGFACE_API_KEY,
+    get_groq_api_key
+)
+from .profiling import profiler
+
+logger = logging.getLogger(__name__)
+
+'''
+LLM provider layer.
+
+Every provider streams tokens for a plain-text prompt within a timeout
+budget (seconds for the whole request, not per read). Network clients are
+created once per (provider, key) and shared by every RagSystem in the
+process, so Streamlit sessions reuse pooled keep-alive connections
+(huggingface_hub pools connections in its own shared session).
+
+- GroqProvider / HuggingFaceProvider: hosted models
+- StubProvider: local and deterministic, for tests and load runs
+- HedgedProvider: sends to a backup when the primary has not produced a
+  first token within LLM_HEDGE_AFTER_MS and keeps whichever answers first
+
+A StreamHandle passed to stream() lets another thread abort the request:
+cancelling closes the underlying HTTP response, so a losing hedged stream
+gives its worker back instead of holding it until the next token.
+'''
+
+
+class LLMTimeoutError(TimeoutError):
+    """Raised when a provider exceeds its request timeout budget."""
+
+
+class StreamHandle:
+    """Cancels a stream from another thread by closing its HTTP response."""
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self._closers: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def attach(self, closer: Callable[[], None]) -> None:
+        """Register how to abort the in-flight request (runs now if already cancelled)."""
+        with self._lock:
+            if not self.cancelled.is_set():
+                self._closers.append(closer)
+                return
+        closer()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled.set()
+            closers, self._closers = self._closers, []
+        for closer in closers:
+            try:
+                closer()
+            except Exception as e:
+                logger.debug(f"Error closing cancelled stream: {e}")
+
+
+# Shared clients, keyed by (provider, api key)
+_CLIENTS: Dict[Tuple[str, str], object] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _get_client(key: Tuple[str, str], factory):
+    with _CLIENTS_LOCK:
+        if key not in _CLIENTS:
+            _CLIENTS[key] = factory()
+            logger.info(f"✓ Created pooled {key[0]} client")
+        return _CLIENTS[key]
+
+
+class LLMProvider(ABC):
+    name = "base"
+
+    def __init__(self, model: str = LLM_MODEL, temperature: float = LLM_TEMPERATURE):
+        self.model = model
+        self.temperature = temperature
+
+    @abstractmethod
+    def stream(self, prompt: str, timeout: float = LLM_TIMEOUT,
+               handle: Optional[StreamHandle] = None) -> Iterator[str]:
+        """Yield answer tokens; cancelling the handle aborts the request."""
+
+    def generate(self, prompt: str, timeout: float = LLM_TIMEOUT) -> str:
+        return "".join(self.stream(prompt, timeout=timeout))
+
+    @staticmethod
+    def _check_deadline(deadline: float, name: str) -> None:
+        if time.monotonic() > deadline:
+            raise LLMTimeoutError(f"{name} exceeded its timeout budget")
+
+
+class GroqProvider(LLMProvider):
+    name = "groq"
+
+    def __init__(self, model: str = GROQ_MODEL, temperature: float = LLM_TEMPERATURE,
+                 api_key: Optional[str] = None):
+        super().__init__(model, temperature)
+        api_key = api_key or get_groq_api_key()
+        if not api_key:
+            raise ValueError("GROQ_API_KEY is required for Groq provider")
+
+        def factory():
+            import httpx
+            from groq import Groq
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_CONNECTIONS
+                )
+            )
+            # Retries would eat the timeout budget; hedging covers slow calls
+            return Groq(api_key=api_key, http_client=http_client, max_retries=0)
+
+        self.client = _get_client((self.name, api_key), factory)
+
+    def stream(self, prompt: str, timeout: float = LLM_TIMEOUT,
+               handle: Optional[StreamHandle] = None) -> Iterator[str]:
+        deadline = time.monotonic() + timeout
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=self.temperature,
+            stream=True,
+            timeout=timeout
+        )
+        if handle:
+            # Closing the response unblocks a read waiting on the next chunk
+            handle.attach(response.close)
+        for chunk in response:
+            if handle and handle.cancelled.is_set():
+                return
+            self._check_deadline(deadline, self.name)
+            token = chunk.choices[0].delta.content if chunk.choices else None
+            if token:
+                yield token
+
+
+class HuggingFaceProvider(LLMProvider):
+    name = "huggingface"
+
+    def __init__(self, model: str = HUGGINGFACE_MODEL, temperature: float = LLM_TEMPERATURE,
+                 api_key: Optional[str] = None):
+        super().__init__(model, temperature)
+        self.api_key = api_key or HUGGINGFACE_API_KEY
+        if not self.api_key:
+            raise ValueError("HUGGINGFACE_API_KEY is required")
+
+    def _client(self, timeout: float):
+        from huggingface_hub import InferenceClient
+
+        # The timeout lives on the client and bounds connecting and every read,
+        # including the wait for the first token. Connections come from
+        # huggingface_hub's shared session, so a client per request is cheap
+        return InferenceClient(token=self.api_key, timeout=timeout)
+
+    def stream(self, prompt: str, timeout: float = LLM_TIMEOUT,
+               handle: Optional[StreamHandle] = None) -> Iterator[str]:
+        deadline = time.monotonic() + timeout
+        response = self._client(timeout).chat_completion(
+            messages=[{"role": "user", "content": prompt}],
+            model=self.model,
+            temperature=self.temperature,
+            stream=True
+        )
+        for chunk in response:
+            if handle and handle.cancelled.is_set():
+                return
+            self._check_deadline(deadline, self.name)
+            token = chunk.choices[0].delta.content if chunk.choices else None
+            if token:
+                yield token
+
+
+class StubProvider(LLMProvider):
+    """Deterministic local provider: the same prompt always gives the same answer."""
+    name = "stub"
+
+    def __init__(self, model: str = "stub", temperature: float = 0.0,
+                 first_token_ms: float = 0.0, token_ms: float = 0.0):
+        super().__init__(model, temperature)
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+
+    def stream(self, prompt: str, timeout: float = LLM_TIMEOUT,
+               handle: Optional[StreamHandle] = None) -> Iterator[str]:
+        deadline = time.monotonic() + timeout
+        cancelled = handle.cancelled if handle else threading.Event()
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+
+        # Echo the start of the context so answers still depend on retrieval
+        context = prompt.split("Context:", 1)[-1].split("Question:", 1)[0].strip()
+        words = context.split()[:30] or ["I", "don't", "have", "enough", "information."]
+        tokens = [f"[stub {digest}]"] + words
+
+        # Waiting on the cancel event instead of sleeping frees the thread on cancel
+        if self.first_token_ms and cancelled.wait(self.first_token_ms / 1000):
+            return
+        for i, token in enumerate(tokens):
+            if i and self.token_ms and cancelled.wait(self.token_ms / 1000):
+                return
+            self._check_deadline(deadline, self.name)
+            yield token if i == 0 else " " + token
+
+
+# Shared pool for hedged requests: primary and backup each take a worker
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=max(LLM_HEDGE_WORKERS, 2), thread_name_prefix="llm-hedge")
+
+
+class HedgedProvider(LLMProvider):
+    """Race a backup provider against a slow primary."""
+    name = "hedged"
+
+    def __init__(self, primary: LLMProvider, backup: LLMProvider, hedge_after_ms: float = LLM_HEDGE_AFTER_MS):
+        super().__init__(primary.model, primary.temperature)
+        self.primary = primary
+        self.backup = backup
+        self.hedge_after_ms = hedge_after_ms
+
+    def stream(self, prompt: str, timeout: float = LLM_TIMEOUT,
+               handle: Optional[StreamHandle] = None) -> Iterator[str]:
+        deadline = time.monotonic() + timeout
+        events: "queue.Queue" = queue.Queue()
+        providers = {"primary": self.primary, "backup": self.backup}
+        handles = {tag: StreamHandle() for tag in providers}
+        if handle:
+            handle.attach(lambda: [h.cancel() for h in handles.values()])
+
+        def run(tag: str) -> None:
+            # Queued behind other work until after the race was decided
+            if handles[tag].cancelled.is_set():
+                return
+            try:
+                remaining = max(deadline - time.monotonic(), 0.001)
+                for token in providers[tag].stream(prompt, timeout=remaining, handle=handles[tag]):
+                    if handles[tag].cancelled.is_set():
+                        return
+                    events.put((tag, "token", token))
+                events.put((tag, "done", None))
+            except Exception as e:
+                # Closing a cancelled stream surfaces as an error; nobody is listening
+                if not handles[tag].cancelled.is_set():
+                    events.put((tag, "error", e))
+
+        alive = set()
+
+        def start(tag: str) -> None:
+            alive.add(tag)
+            _HEDGE_POOL.submit(profiler.bind(run), tag)
+
+        try:
+            start("primary")
+            hedged = False
+            hedge_at = time.monotonic() + self.hedge_after_ms / 1000
+
+            # Phase 1: wait for the first token; start the backup when the
+            # primary is slow or fails before producing anything
+            winner = None
+            while winner is None:
+                now = time.monotonic()
+                if now > deadline:
+                    raise LLMTimeoutError("No provider produced a token within the timeout budget")
+                wait = deadline - now
+                if not hedged:
+                    wait = min(wait, max(hedge_at - now, 0))
+                try:
+                    tag, kind, value = events.get(timeout=wait)
+                except queue.Empty:
+                    if not hedged and time.monotonic() >= hedge_at:
+                        logger.info(f"Hedging: {self.primary.name} slow, sending to {self.backup.name}")
+                        start("backup")
+                        hedged = True
+                    continue
+
+                if kind == "error":
+                    logger.warning(f"{providers[tag].name} failed before first token: {value}")
+                    alive.discard(tag)
+                    if not hedged:
+                        start("backup")
+                        hedged = True
+                    elif not alive:
+                        raise value
+                    continue
+
+                winner = tag
+                if kind == "token":
+                    yield value
+
+            # Phase 2: stream the winner, abort the loser's request
+            for tag in providers:
+                if tag != winner:
+                    handles[tag].cancel()
+            if kind == "done":
+                return
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LLMTimeoutError(f"{providers[winner].name} exceeded its timeout budget")
+                try:
+                    tag, kind, value = events.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+                if tag != winner:
+                    continue
+                if kind == "token":
+                    yield value
+                elif kind == "done":
+                    return
+                else:
+                    raise value
+        finally:
+            # Stop both sides if the caller stops reading early or time ran out
+            for stream_handle in handles.values():
+                stream_handle.cancel()
+
+
+_PROVIDERS = {
+    GroqProvider.name: GroqProvider,
+    HuggingFaceProvider.name: HuggingFaceProvider,
+    StubProvider.name: StubProvider
+}
+
+
+def get_provider(name: str = LLM_PROVIDER, model: Optional[str] = None) -> LLMProvider:
+    """Create a single provider by name."""
+    if name not in _PROVIDERS:
+        raise ValueError(f"Unknown LLM provider '{name}' (expected one of {sorted(_PROVIDERS)})")
+    if name == StubProvider.name:
+        return StubProvider()
+    # Without a model each provider uses its own default (GROQ_MODEL, HUGGINGFACE_MODEL)
+    return _PROVIDERS[name](model=model) if model else _PROVIDERS[name]()
+
+
+def build_llm_provider() -> LLMProvider:
+    """Provider from config, wrapped in hedging when a backup is configured."""
+    primary = get_provider(LLM_PROVIDER, model=LLM_MODEL or None)
+    if not LLM_BACKUP_PROVIDER:
+        return primary
+
+    backup = get_provider(LLM_BACKUP_PROVIDER, model=LLM_BACKUP_MODEL or None)
+    logger.info(f"✓ Hedging {primary.name} with {backup.name} after {LLM_HEDGE_AFTER_MS:.0f} ms")
+    return HedgedProvider(primary, backup, hedge_after_ms=LLM_HEDGE_AFTER_MS)
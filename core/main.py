@@ -1,18 +1,25 @@
 import os
 import streamlit as st
 from .rag_logic import RagLogic
-from .vector_db import VectorDB
-from typing import List, Dict
+from .vector_db import VectorDB, SearchHit, apply_relevance_cutoff
+from typing import List, Dict, Optional
 from .prompt import template
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_groq import ChatGroq
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.output_parsers import StrOutputParser
-from .config import get_groq_api_key
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from .llm_providers import LLMProvider, build_llm_provider
+from .profiling import profiler
 from .config import (
     LLM_MODEL, 
-    LLM_TEMPERATURE,
-    PERSIST_DIRECTORY
+    LLM_TIMEOUT,
+    PERSIST_DIRECTORY,
+    INDEX_SNAPSHOT,
+    READ_ONLY,
+    INDEX_AUTO_PUBLISH,
+    TOP_K,
+    ADAPTIVE_RETRIEVAL,
+    RETRIEVAL_MIN_SCORE,
+    RETRIEVAL_MAX_SCORE_DROP,
+    RETRIEVAL_MIN_K
 )
 import logging
 
@@ -22,14 +29,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Answer when no retrieved chunk is relevant enough to send to the LLM
+NO_RELEVANT_DOCUMENTS_ANSWER = "I couldn't find anything relevant to that question in the indexed documents."
+
 class RagSystem:
-    def __init__(self):    
+    def __init__(
+        self,
+        read_only: bool = READ_ONLY,
+        llm_provider: Optional[LLMProvider] = None,
+        persist_directory: str = PERSIST_DIRECTORY
+    ):    
         # Initialize RagLogic and VectorDB
+        # read_only: serve published index versions (hot-reloaded), no ingestion
+        # llm_provider: override the configured provider (e.g. StubProvider in tests)
+        # persist_directory: where the index lives (e.g. a scratch dir for load runs)
 
-        # Validate API key first
-        Groq_API_KEY = get_groq_api_key()
-        if not Groq_API_KEY:
-            raise ValueError("Groq_API_KEY is required")
+        # Build the LLM provider first: it validates API keys
+        logger.info(f"Loading LLM: {LLM_MODEL}...")
+        self.llm = llm_provider or build_llm_provider()
+        logger.info(f"✓ LLM provider initialized: {self.llm.name}")
         
         # Initialize RagLogic
         logger.info("Loading document processor...")
@@ -39,19 +57,12 @@ class RagSystem:
         logger.info("Loading vector database...")
         self.vector_db = VectorDB(
             rag_logic=self.rag_logic,
-            persist_directory=PERSIST_DIRECTORY
+            persist_directory=persist_directory,
+            snapshot_path=INDEX_SNAPSHOT or None,
+            read_only=read_only
         )
         logger.info("✓ VectorDB initialized")
         
-        # Initialize LLM
-        logger.info(f"Loading LLM: {LLM_MODEL}...")
-        self.llm = ChatGroq(
-            api_key=Groq_API_KEY,
-            model=LLM_MODEL,
-            temperature=LLM_TEMPERATURE
-        )
-        logger.info(f"✓ LLM initialized: {LLM_MODEL}")
-        
         # Initialize QA chain
         self._initialize_qa_chain()
 
@@ -59,48 +70,44 @@ class RagSystem:
         """Initialize the question-answering chain using LCEL."""
         
         # Check if vector store is initialized
-        if not self.vector_db.vector_store:
+        if not self.vector_db.is_ready():
             logger.warning("Vector store not initialized. Add documents first.")
-            self.retriever = None
             self.qa_chain = None
             return
         
-        # Create retriever
-        try:
-            self.retriever = self.vector_db.vector_store.as_retriever(
-                search_kwargs={"k": 3}
-            )
-            logger.info("✓ Retriever created")
-        except Exception as e:
-            logger.error(f"✗ Error creating retriever: {e}")
-            self.retriever = None
-            self.qa_chain = None
-            return
-        
-        prompt = ChatPromptTemplate.from_template(template)
-        
-        # Create chain using LCEL
-        def format_docs(docs):
-            return "\n\n".join(doc.page_content for doc in docs)
+        prompt = PromptTemplate.from_template(template)
         
+        # Retrieval happens in ask_question (across all shards), so the
+        # chain only receives the already formatted context
         try:
             self.qa_chain = (
-                {
-                    "context": self.retriever | format_docs,
-                    "input": RunnablePassthrough()
-                }
-                | prompt
-                | self.llm
-                | StrOutputParser()
+                prompt
+                | RunnableLambda(self._generate)
             )
             logger.info("✓ QA chain initialized")
         except Exception as e:
             logger.error(f"✗ Error creating QA chain: {e}")
             self.qa_chain = None
+
+    def _generate(self, prompt_value, config: RunnableConfig) -> str:
+        # Per-request timeout budget comes in through the chain config
+        timeout = config.get("configurable", {}).get("llm_timeout", LLM_TIMEOUT)
+        return self.llm.generate(prompt_value.to_string(), timeout=timeout)
+
+    @staticmethod
+    def _format_docs(docs: List) -> str:
+        return "\n\n".join(doc.page_content for doc in docs)
     
-    def add_document(self, file_path: str) -> bool:
+    def _publish_if_enabled(self, success: bool) -> None:
+        # Let read-only replicas pick up the new content: one background
+        # export after the batch, not a full export per uploaded file
+        if success and INDEX_AUTO_PUBLISH:
+            self.vector_db.schedule_publish()
+
+    def add_document(self, file_path: str, shard: Optional[str] = None) -> bool:
         """Add a single document to the system."""
-        success = self.vector_db.process_and_add_file(file_path)
+        success = self.vector_db.process_and_add_file(file_path, shard=shard)
+        self._publish_if_enabled(success)
         
         # Reinitialize QA chain if this was the first document
         if success and self.qa_chain is None:
@@ -109,9 +116,10 @@ class RagSystem:
         
         return success
     
-    def add_documents(self, file_paths: List[str]) -> bool:
+    def add_documents(self, file_paths: List[str], shard: Optional[str] = None) -> bool:
         """Add multiple documents to the system."""
-        success = self.vector_db.process_and_add_files(file_paths)
+        success = self.vector_db.process_and_add_files(file_paths, shard=shard)
+        self._publish_if_enabled(success)
         
         # Reinitialize QA chain if this was the first batch
         if success and self.qa_chain is None:
@@ -121,17 +129,31 @@ class RagSystem:
         return success
         
         
-    def ask_question(self, question: str, top_k = 3) -> Dict:
+    def ask_question(
+        self,
+        question: str,
+        top_k: int = TOP_K,
+        shards: Optional[List[str]] = None,
+        timeout: Optional[float] = None,
+        adaptive: Optional[bool] = None
+    ) -> Dict:
         
         '''
         1. ask question and get answers 
         2. question should not be empty
-        3. retreive top_k answers
+        3. retreive up to top_k answers (optionally only from the given shards)
+        4. adaptive: drop hits below the similarity floor or after a sharp score drop
+        5. no relevant hits left: answer that directly, without calling the LLM
+        6. generate within the LLM timeout budget (default LLM_TIMEOUT seconds)
         '''
         if not question.strip():
             logger.warning("Empty question provided")
             return {"answer": "Please provide a valid question.", "context": []}
         
+        # A replica may have received its first index version since startup
+        if self.qa_chain is None and self.vector_db.is_ready():
+            self._initialize_qa_chain()
+
         # Check if QA chain is initialized
         if self.qa_chain is None:
             logger.error("QA chain not initialized. Please add documents first.")
@@ -141,46 +163,74 @@ class RagSystem:
             }
         
         try:
-            # Update retriever k
-            self.retriever.search_kwargs["k"] = top_k
-            
-            # Get relevant documents
-            logger.info(f"Processing question: {question}")
-            docs = self.retriever.invoke(question)
-            
-            # Get answer
-            answer = self.qa_chain.invoke(question)
-            
-            logger.info(f"✓ Answer generated with {len(docs)} sources")
-            
-            return {
-                "answer": answer,
-                "context": docs
-            }
+            with profiler.request("ask", top_k=top_k, shards=shards) as trace:
+                # Get relevant chunks (ids, scores and compact metadata only)
+                logger.info(f"Processing question: {question}")
+                with trace.stage("retrieve"):
+                    hits = self.vector_db.search_hits(question, top_k=top_k, shards=shards)
+
+                # Only send the chunks that are actually relevant
+                use_cutoff = ADAPTIVE_RETRIEVAL if adaptive is None else adaptive
+                if use_cutoff:
+                    retrieved = len(hits)
+                    hits = apply_relevance_cutoff(
+                        hits,
+                        min_score=RETRIEVAL_MIN_SCORE,
+                        max_drop=RETRIEVAL_MAX_SCORE_DROP,
+                        min_k=RETRIEVAL_MIN_K
+                    )
+                    logger.info(f"  Kept {len(hits)}/{retrieved} chunks after relevance cutoff")
+
+                # An empty context would only make the LLM guess
+                if not hits:
+                    logger.info("No relevant chunks; answering without the LLM")
+                    return {"answer": NO_RELEVANT_DOCUMENTS_ANSWER, "context": []}
+                
+                # Hydrate text only for what goes into the prompt
+                with trace.stage("hydrate"):
+                    docs = self.vector_db.hydrate(hits)
+                
+                # Get answer
+                with trace.stage("generate"):
+                    answer = self.qa_chain.invoke(
+                        {
+                            "context": self._format_docs(docs),
+                            "input": question
+                        },
+                        config={"configurable": {"llm_timeout": timeout or LLM_TIMEOUT}}
+                    )
+                
+                logger.info(f"✓ Answer generated with {len(hits)} sources")
+                
+                return {
+                    "answer": answer,
+                    "context": hits
+                }
         
         except Exception as e:
             logger.error(f"✗ Error answering question: {e}")
             return {"answer": f"Error: {str(e)}", "context": []}
     
-    def ask_with_sources(self, question: str, top_k: int = 3) -> Dict:
-        result = self.ask_question(question, top_k)
+    def ask_with_sources(
+        self,
+        question: str,
+        top_k: int = TOP_K,
+        shards: Optional[List[str]] = None,
+        timeout: Optional[float] = None,
+        adaptive: Optional[bool] = None
+    ) -> Dict:
+        result = self.ask_question(question, top_k, shards=shards, timeout=timeout, adaptive=adaptive)
 
+        # Sources stay lightweight; text is fetched with get_source_text when shown
         sources = []
-        for doc in result.get("context", []):
-            # Try multiple possible keys for page number
-            page_num = (
-                doc.metadata.get("page") or 
-                doc.metadata.get("page_number") or 
-                doc.metadata.get("page_label") or
-                "N/A"
-            )
-            
+        for hit in result.get("context", []):
             source_info = {
-                "filename": doc.metadata.get("filename") or doc.metadata.get("source", "Unknown"),
-                "page": page_num,
-                "chunk_id": doc.metadata.get("chunk_id", "N/A"),
-                "content": doc.page_content[:1000] + "..." if len(doc.page_content) > 1000 else doc.page_content,
-                "all_metadata": doc.metadata  # Temporary: to see all metadata
+                "id": hit.id,
+                "filename": hit.metadata.get("filename") or hit.metadata.get("source", "Unknown"),
+                "page": hit.metadata.get("page") or "N/A",
+                "chunk_id": hit.metadata.get("chunk_id", "N/A"),
+                "shard": hit.shard,
+                "score": round(hit.score, 4)
             }
             sources.append(source_info)
         
@@ -189,6 +239,12 @@ class RagSystem:
             "sources": sources
         }
     
+    def get_source_text(self, source: Dict, max_chars: int = 1000) -> str:
+        """Hydrate the text of a source returned by ask_with_sources."""
+        hit = SearchHit(id=source["id"], score=source.get("score", 0.0), metadata={"shard": source.get("shard")})
+        text = self.vector_db.get_chunk_text(hit)
+        return text[:max_chars] + "..." if len(text) > max_chars else text
+    
     def get_stats(self) -> Dict:
         """Get system statistics."""
         return self.vector_db.get_stats()
@@ -0,0 +1,177 @@
+import os
+import json
+import gzip
+import shutil
+import hashlib
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional
+from langchain_core.documents import Document
+from .config import PARSE_CACHE, PARSE_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+'''
+Persistent parse-output cache.
+
+Parsing (Unstructured, OCR) is by far the slowest ingestion step, and its
+output only depends on the file bytes and on how the file was parsed. The
+parsed documents of every file are kept on disk as
+
+    <PARSE_CACHE_DIR>/<sha[:2]>/<sha256 of content>-<parser tag>.json.gz
+
+so re-chunking, re-embedding and index rebuilds start from cached text.
+The parser tag names the loader, its mode and version: a new parser
+version or different settings simply miss the cache. Path-dependent metadata
+(source, filename, file_directory) is not cached: an entry records which of
+those keys the parser set, and a hit fills them in from the file being
+loaded, so cached and freshly parsed documents carry the same metadata.
+A loader that declines a file (returns None, e.g. pypdf on a scanned PDF)
+leaves an empty <...>.declined marker instead.
+'''
+
+# Bump when the cached layout changes
+CACHE_FORMAT_VERSION = 2
+
+# Path-dependent metadata and how to derive it from the file being loaded,
+# so a moved or renamed file still hits
+PATH_METADATA_KEYS = {
+    "source": lambda file_path: file_path,
+    "filename": os.path.basename,
+    "file_directory": os.path.dirname
+}
+
+
+def file_digest(file_path: str, block_size: int = 1 << 20) -> str:
+    """sha256 of the file content."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParseCache:
+
+    def __init__(self, cache_dir: str = PARSE_CACHE_DIR, enabled: bool = PARSE_CACHE):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+
+    def _path(self, digest: str, parser_tag: str) -> str:
+        tag = "".join(c if c.isalnum() or c in ".-_" else "_" for c in parser_tag)
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}-{tag}-v{CACHE_FORMAT_VERSION}.json.gz")
+
+    def _declined_path(self, digest: str, parser_tag: str) -> str:
+        return self._path(digest, parser_tag)[:-len(".json.gz")] + ".declined"
+
+    def is_declined(self, digest: str, parser_tag: str) -> bool:
+        """True when this parser already declined this content."""
+        return self.enabled and os.path.exists(self._declined_path(digest, parser_tag))
+
+    def put_declined(self, digest: str, parser_tag: str) -> None:
+        if not self.enabled:
+            return
+        path = self._declined_path(digest, parser_tag)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, "a").close()
+        except Exception as e:
+            logger.error(f"Could not write parse cache entry: {e}")
+
+    def get(self, digest: str, parser_tag: str, file_path: Optional[str] = None) -> Optional[List[Document]]:
+        """Cached documents for this content and parser, or None on a miss.
+
+        Path metadata the parser had set is restored from file_path.
+        """
+        if not self.enabled:
+            return None
+        path = self._path(digest, parser_tag)
+        if not os.path.exists(path):
+            return None
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entries = json.load(f)
+            documents = []
+            for entry in entries:
+                metadata = entry["metadata"]
+                if file_path:
+                    for key in entry.get("path_keys", []):
+                        metadata[key] = PATH_METADATA_KEYS[key](file_path)
+                documents.append(Document(page_content=entry["page_content"], metadata=metadata))
+            return documents
+        except Exception as e:
+            # A corrupt entry is just a miss; it is rewritten on the next parse
+            logger.warning(f"Ignoring unreadable parse cache entry {path}: {e}")
+            return None
+
+    def put(self, digest: str, parser_tag: str, documents: List[Document]) -> None:
+        if not self.enabled or not documents:
+            return
+        path = self._path(digest, parser_tag)
+        entries = [
+            {
+                "page_content": doc.page_content,
+                "metadata": {k: v for k, v in doc.metadata.items() if k not in PATH_METADATA_KEYS},
+                "path_keys": [k for k in PATH_METADATA_KEYS if k in doc.metadata]
+            }
+            for doc in documents
+        ]
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(entries, f, default=str)
+            # Concurrent writers of the same entry write identical content
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Could not write parse cache entry: {e}")
+
+    def stats(self) -> Dict:
+        entries, size = 0, 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json.gz"):
+                    entries += 1
+                    size += os.path.getsize(os.path.join(root, name))
+        return {"cache_dir": self.cache_dir, "enabled": self.enabled, "entries": entries, "bytes": size}
+
+    def clear(self) -> None:
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+        logger.info(f"✓ Cleared parse cache: {self.cache_dir}")
+
+
+# Process-wide cache configured from the environment
+parse_cache = ParseCache()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from .document_loader import find_files, multiple_documents_loader
+
+    parser = argparse.ArgumentParser(description="Inspect, clear or warm the parse-output cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("stats", help="Show cache size")
+    sub.add_parser("clear", help="Delete every cached parse")
+    warm = sub.add_parser("warm", help="Parse files (or directories) into the cache")
+    warm.add_argument("paths", nargs="+")
+    warm.add_argument("--mode", default="single")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        print(json.dumps(parse_cache.stats(), indent=2))
+    elif args.command == "clear":
+        parse_cache.clear()
+    elif args.command == "warm":
+        files = []
+        for path in args.paths:
+            files.extend(find_files(path) if os.path.isdir(path) else [path])
+        documents = multiple_documents_loader(files, mode=args.mode)
+        print(f"Parsed {len(files)} file(s) into {len(documents)} document(s)")
+        print(json.dumps(parse_cache.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
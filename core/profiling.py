@@ -0,0 +1,240 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import logging
+import threading
+from glob import glob
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from .config import (
+    PROFILE_SAMPLE_RATE,
+    PROFILE_SLOW_MS,
+    PROFILE_DIR,
+    PROFILE_MAX_FILES,
+    PROFILE_INTERVAL_MS
+)
+
+logger = logging.getLogger(__name__)
+
+'''
+Opt-in request profiler.
+
+Wrap a request in `profiler.request(kind)` and its stages in
+`trace.stage(name)`. While profiling is enabled, a background thread samples
+the Python stack of every thread that is inside a request, plus the pool
+workers running work submitted with `profiler.bind(fn)` (shard searches and
+writes, hedged LLM streams); their stacks sit under a "[thread]" frame of
+the stage that submitted them. When the request
+ends it is kept if it was picked by PROFILE_SAMPLE_RATE or took longer than
+PROFILE_SLOW_MS; kept requests are written to PROFILE_DIR as
+
+    <time>-<kind>-<id>.trace.json   stage timings + request metadata
+    <time>-<kind>-<id>.collapsed    "frame;frame;frame count" stacks
+                                    (flamegraph.pl, speedscope, inferno)
+
+Only the newest PROFILE_MAX_FILES requests are kept on disk. With both
+PROFILE_SAMPLE_RATE and PROFILE_SLOW_MS at 0 every call is a no-op.
+'''
+
+
+class RequestTrace:
+    """Stage timings and stack samples for one request."""
+
+    def __init__(self, kind: str, metadata: Optional[Dict] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.metadata = metadata or {}
+        self.thread_id = threading.get_ident()
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.duration_ms = 0.0
+        self.stages: List[Dict] = []
+        self.stacks: Counter = Counter()
+        self.error: Optional[str] = None
+        self._stage_stack: List[str] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        self._stage_stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append({
+                "stage": "/".join(self._stage_stack),
+                "start_ms": round((start - self.start) * 1000, 3),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3)
+            })
+            self._stage_stack.pop()
+
+    def add_sample(self, frame, thread: Optional[str] = None) -> None:
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        # Root first, with the current stage as the top-level frame
+        stage = "/".join(self._stage_stack) or "request"
+        prefix = [self.kind, stage] + ([f"[{thread}]"] if thread else [])
+        self.stacks[";".join(prefix + frames[::-1])] += 1
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 3),
+            "error": self.error,
+            "metadata": self.metadata,
+            "stages": self.stages,
+            "stack_samples": sum(self.stacks.values())
+        }
+
+
+class _NullTrace:
+    """Stand-in used when profiling is off."""
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        yield
+
+
+class RequestProfiler:
+
+    def __init__(
+        self,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        slow_ms: float = PROFILE_SLOW_MS,
+        output_dir: str = PROFILE_DIR,
+        max_files: int = PROFILE_MAX_FILES,
+        interval_ms: float = PROFILE_INTERVAL_MS
+    ):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.output_dir = output_dir
+        self.max_files = max_files
+        self.interval = interval_ms / 1000
+        self._active: Dict[int, RequestTrace] = {}
+        # Pool threads working for an active request: thread id -> (trace, thread label)
+        self._workers: Dict[int, Tuple[RequestTrace, str]] = {}
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.slow_ms > 0
+
+    def _ensure_sampler(self) -> None:
+        if self._sampler and self._sampler.is_alive():
+            return
+        self._sampler = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+        self._sampler.start()
+
+    def _sample_loop(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active.values())
+                workers = list(self._workers.items())
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for trace in active:
+                frame = frames.get(trace.thread_id)
+                if frame is not None:
+                    trace.add_sample(frame)
+            for thread_id, (trace, thread) in workers:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    trace.add_sample(frame, thread)
+
+    def bind(self, fn: Callable) -> Callable:
+        """Wrap fn for a worker pool so its stack is sampled into the caller's request."""
+        with self._lock:
+            trace = self._active.get(threading.get_ident())
+        if trace is None:
+            return fn
+
+        def run(*args, **kwargs):
+            thread_id = threading.get_ident()
+            # "vector-shard_3" -> "vector-shard": one flame per pool
+            thread = threading.current_thread().name.rsplit("_", 1)[0]
+            with self._lock:
+                if trace in self._active.values():
+                    self._workers[thread_id] = (trace, thread)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    if self._workers.get(thread_id, (None,))[0] is trace:
+                        del self._workers[thread_id]
+        return run
+
+    @contextmanager
+    def request(self, kind: str, **metadata) -> Iterator:
+        """Profile one request. Yields a trace with a stage() context manager."""
+        if not self.enabled:
+            yield _NullTrace()
+            return
+
+        trace = RequestTrace(kind, metadata)
+        sampled = random.random() < self.sample_rate
+        with self._lock:
+            outer = self._active.get(trace.thread_id)
+            if outer is None:
+                self._active[trace.thread_id] = trace
+
+        # Nested requests on the same thread become a stage of the outer trace
+        if outer is not None:
+            with outer.stage(kind):
+                yield outer
+            return
+        self._ensure_sampler()
+
+        try:
+            yield trace
+        except Exception as e:
+            trace.error = repr(e)
+            raise
+        finally:
+            with self._lock:
+                self._active.pop(trace.thread_id, None)
+                # Workers still running for it (e.g. a losing hedged stream) stop counting
+                for thread_id in [t for t, (owner, _) in self._workers.items() if owner is trace]:
+                    del self._workers[thread_id]
+            trace.duration_ms = (time.perf_counter() - trace.start) * 1000
+            slow = self.slow_ms > 0 and trace.duration_ms >= self.slow_ms
+            if sampled or slow:
+                trace.metadata["reason"] = "slow" if slow else "sampled"
+                self._dump(trace)
+
+    def _dump(self, trace: RequestTrace) -> None:
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            stamp = trace.started_at.strftime("%Y%m%dT%H%M%S%f")
+            base = os.path.join(self.output_dir, f"{stamp}-{trace.kind}-{trace.id}")
+            with open(base + ".trace.json", "w") as f:
+                json.dump(trace.to_dict(), f, indent=2, default=str)
+            with open(base + ".collapsed", "w") as f:
+                for stack, count in trace.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            logger.info(f"Profiled {trace.kind} ({trace.duration_ms:.0f} ms) -> {base}.trace.json")
+            self._rotate()
+        except Exception as e:
+            logger.error(f"Could not write request profile: {e}")
+
+    def _rotate(self) -> None:
+        traces = sorted(glob(os.path.join(self.output_dir, "*.trace.json")))
+        for path in traces[:-self.max_files] if self.max_files > 0 else []:
+            for stale in (path, path[:-len(".trace.json")] + ".collapsed"):
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+
+# Process-wide profiler configured from the environment
+profiler = RequestProfiler()
@@ -5,7 +5,7 @@ from .document_loader import multiple_documents_loader, load_from_directory
 from langchain_text_splitters import RecursiveCharacterTextSplitter   
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_core.documents import Document
-from .config import EMBEDDING_MODEL
+from .config import EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP
 import logging
 
 logging.basicConfig(
@@ -15,7 +15,7 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class RagLogic:
-    def __init__(self, model_name: str = EMBEDDING_MODEL, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self, model_name: str = EMBEDDING_MODEL, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
 
         # Validate inputs
         if chunk_size <= 0:
@@ -25,6 +25,10 @@ class RagLogic:
         if chunk_overlap >= chunk_size:
             raise ValueError("chunk_overlap must be less than chunk_size")
         
+        self.model_name = model_name
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
         # Initialize text splitter and embeddings
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
@@ -0,0 +1,631 @@
+import os
+import json
+import zlib
+import shutil
+import struct
+import weakref
+import logging
+import threading
+import argparse
+from glob import glob
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .vector_codecs import VectorCodec, Float16Codec, get_codec, load_codec
+from .config import (
+    EMBEDDING_MODEL,
+    PERSIST_DIRECTORY,
+    INDEX_VERSIONS_DIR,
+    INDEX_KEEP_VERSIONS,
+    VECTOR_CODEC,
+    RESCORE_FACTOR,
+    RESCORE_MIN_CANDIDATES
+)
+
+logger = logging.getLogger(__name__)
+
+'''
+Portable index snapshot.
+
+The snapshot file holds everything a replica scans or decodes per query:
+
+    magic (8 bytes) | header length (uint64) | JSON header | padding
+    data section:
+        codes         vector codes [count, ...]: float16 rows, int8 rows or pq codes
+        codec params  float32 codec parameters (int8 / pq only)
+        text offsets  uint64  [count + 1]
+        texts         zlib compressed chunk text, back to back
+        id offsets    uint64  [count + 1]
+        ids           utf-8 chunk ids, back to back
+        id order      int64   [count], rows sorted by id
+        meta offsets  uint64  [count + 1]
+        metadata      one JSON object per row
+        shard column  uint16  [count], index into shards
+
+The JSON header is the manifest: format version, embedding model, shard
+names, indexed files and the offsets of each data section (relative to the
+data section start). The data section is memory-mapped on open, so opening costs the same for
+any corpus size: ids and metadata are decoded per row when a result needs
+them, and id lookups binary-search the id order.
+
+With a compressed codec (int8 / pq), queries scan the codes and re-score a
+small candidate set exactly on float16 rows. Those rows live in a side file,
+<snapshot>.rescore (float16 [count, dim]), so only the candidates' rows are
+ever read and the always-touched data stays the size of the codes.
+open_snapshot shares one mapping per file across every RagSystem in the
+process.
+
+Published versions: the ingestion side writes immutable snapshots into a
+versions directory and then atomically rewrites its CURRENT file to point at
+the newest one. Read-only replicas poll CURRENT and swap versions.
+'''
+
+SNAPSHOT_MAGIC = b"RAGSNAP\x00"
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_SUFFIX = ".ragsnap"
+RESCORE_SUFFIX = ".rescore"
+CURRENT_FILE = "CURRENT"
+
+_ALIGN = 64
+_SCORE_BLOCK_ROWS = 65536
+# Where-clause operators evaluated on snapshots (besides plain equality and $and)
+_FILTER_OPERATORS = ("$eq", "$in")
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _pad_to(f, offset: int) -> None:
+    f.write(b"\x00" * (offset - f.tell()))
+
+
+def _offsets(blobs: List[bytes]) -> np.ndarray:
+    # Start of every blob plus the end of the last one
+    offsets = np.zeros(len(blobs) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(b) for b in blobs], dtype=np.uint64)
+    return offsets
+
+
+def read_snapshot_header(path: str) -> Tuple[Dict, int]:
+    """Read and validate the snapshot header. Returns (header, data_offset)."""
+    with open(path, "rb") as f:
+        magic = f.read(len(SNAPSHOT_MAGIC))
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"Not an index snapshot: {path}")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+
+    version = header.get("format_version")
+    if version != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported snapshot format version {version} (expected {SNAPSHOT_FORMAT_VERSION})"
+        )
+    return header, _align(len(SNAPSHOT_MAGIC) + 8 + header_len)
+
+
+def check_embedding_model(header: Dict, expected_model: str = EMBEDDING_MODEL) -> None:
+    """Refuse snapshots whose vectors came from a different embedding model."""
+    model = header.get("embedding_model")
+    if model != expected_model:
+        raise ValueError(
+            f"Snapshot was built with embedding model '{model}' "
+            f"but EMBEDDING_MODEL is '{expected_model}'"
+        )
+
+
+# Export (writer side)
+def export_snapshot(vector_db, output_path: str, codec_name: str = VECTOR_CODEC) -> Dict:
+    """Write every shard of a Chroma-backed VectorDB to a single snapshot file."""
+    from .vector_db import SearchHit, _iter_collection
+
+    if not vector_db.shards:
+        raise ValueError("Only a Chroma-backed VectorDB can be exported")
+
+    ids: List[str] = []
+    metadatas: List[Dict] = []
+    vector_pages: List[np.ndarray] = []
+
+    for shard in vector_db.shard_names:
+        exported = 0
+        for page in _iter_collection(vector_db.shards[shard]._collection, ["embeddings", "metadatas"]):
+            ids.extend(page["ids"])
+            metadatas.extend({**(m or {}), "shard": shard} for m in page["metadatas"])
+            vector_pages.append(np.asarray(page["embeddings"], dtype=np.float32))
+            exported += len(page["ids"])
+        logger.info(f"  Exported {exported} vectors from {shard}")
+
+    count = len(ids)
+    vectors = np.concatenate(vector_pages) if vector_pages else np.zeros((0, 0), dtype=np.float32)
+    dim = int(vectors.shape[1]) if count else 0
+
+    # Codes for the scan; compressed codecs also get float16 rows for exact re-scoring
+    codec = get_codec(codec_name if count else Float16Codec.name)
+    codec.fit(vectors)
+    codes = codec.encode(vectors)
+    params = codec.params()
+
+    # Chunk text, compressed per chunk so single chunks can be read back lazily
+    hits = [SearchHit(id=chunk_id, score=0.0, metadata={"shard": m["shard"]}) for chunk_id, m in zip(ids, metadatas)]
+    texts = vector_db.get_chunk_texts(hits)
+    blobs = [zlib.compress(texts.get(chunk_id, "").encode("utf-8"), 6) for chunk_id in ids]
+    text_offsets = _offsets(blobs)
+
+    # Ids and metadata are mapped too, so opening does not parse them all
+    id_blobs = [chunk_id.encode("utf-8") for chunk_id in ids]
+    id_order = np.array(sorted(range(count), key=id_blobs.__getitem__), dtype=np.int64)
+    metadata_blobs = [json.dumps(m, default=str).encode("utf-8") for m in metadatas]
+    shard_index = {shard: i for i, shard in enumerate(vector_db.shard_names)}
+    shard_column = np.array([shard_index[m["shard"]] for m in metadatas], dtype=np.uint16)
+
+    # Lay out sections back to back, each aligned
+    payloads = [
+        ("codes", [codes.tobytes()]),
+        ("codec_params", [params.tobytes()]),
+        ("text_offsets", [text_offsets.tobytes()]),
+        ("texts", blobs),
+        ("id_offsets", [_offsets(id_blobs).tobytes()]),
+        ("ids", id_blobs),
+        ("id_order", [id_order.tobytes()]),
+        ("metadata_offsets", [_offsets(metadata_blobs).tobytes()]),
+        ("metadata", metadata_blobs),
+        ("shard_column", [shard_column.tobytes()])
+    ]
+    sections = {}
+    position = 0
+    for name, chunks in payloads:
+        size = sum(len(c) for c in chunks)
+        sections[name] = [position, size]
+        position = _align(position + size)
+
+    header = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "embedding_model": vector_db.rag_logic.model_name,
+        "codec": codec.config(),
+        "rescore_file": os.path.basename(output_path) + RESCORE_SUFFIX if codec.needs_rescoring else None,
+        "dim": dim,
+        "count": count,
+        "shards": list(vector_db.shard_names),
+        "indexed_files": vector_db.get_indexed_files(),
+        "sections": sections
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_offset = _align(len(SNAPSHOT_MAGIC) + 8 + len(header_bytes))
+
+    # Write to a temp file and rename so readers never see a partial snapshot.
+    # The re-scoring rows go first, so the snapshot never appears without them.
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    rows_path = output_path + RESCORE_SUFFIX
+    if codec.needs_rescoring:
+        with open(rows_path + ".tmp", "wb") as f:
+            f.write(vectors.astype(np.float16).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(rows_path + ".tmp", rows_path)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name, chunks in payloads:
+            _pad_to(f, data_offset + sections[name][0])
+            for chunk in chunks:
+                f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, output_path)
+    if not codec.needs_rescoring and os.path.exists(rows_path):
+        os.remove(rows_path)  # left by an earlier export to the same path
+
+    size = os.path.getsize(output_path)
+    rescore_size = os.path.getsize(rows_path) if codec.needs_rescoring else 0
+    logger.info(
+        f"✓ Snapshot written: {output_path} ({count} chunks, {codec.name}, {size / 1e6:.1f} MB"
+        + (f" + {rescore_size / 1e6:.1f} MB re-scoring rows)" if rescore_size else ")")
+    )
+    return {
+        "path": output_path, "count": count, "dim": dim, "codec": codec.name,
+        "bytes": size, "rescore_bytes": rescore_size
+    }
+
+
+def import_snapshot(snapshot_path: str, persist_directory: str = PERSIST_DIRECTORY,
+                    expected_model: str = EMBEDDING_MODEL) -> str:
+    """Validate a snapshot and install it (and its re-scoring rows) under persist_directory/snapshots."""
+    header, _ = read_snapshot_header(snapshot_path)
+    check_embedding_model(header, expected_model)
+
+    # Re-scoring rows first, so the installed snapshot never appears without them
+    files = [snapshot_path]
+    if header["rescore_file"]:
+        rows_path = os.path.join(os.path.dirname(snapshot_path), header["rescore_file"])
+        if not os.path.exists(rows_path):
+            raise ValueError(f"Re-scoring rows of {snapshot_path} not found: {rows_path}")
+        files.insert(0, rows_path)
+
+    target_dir = os.path.join(persist_directory, "snapshots")
+    os.makedirs(target_dir, exist_ok=True)
+    for source in files:
+        target = os.path.join(target_dir, os.path.basename(source))
+        if os.path.abspath(target) != os.path.abspath(source):
+            tmp_target = target + ".tmp"
+            shutil.copyfile(source, tmp_target)
+            os.replace(tmp_target, target)
+
+    logger.info(f"✓ Snapshot imported: {target} ({header['count']} chunks)")
+    return target
+
+
+# Published versions
+def versions_dir_for(persist_directory: str) -> str:
+    """Versions directory of an index: INDEX_VERSIONS_DIR if set, else inside persist_directory."""
+    return INDEX_VERSIONS_DIR or os.path.join(persist_directory, "versions")
+
+
+def current_snapshot_path(versions_dir: str) -> Optional[str]:
+    """Path of the version CURRENT points at, or None if nothing is published."""
+    pointer = os.path.join(versions_dir, CURRENT_FILE)
+    try:
+        with open(pointer, "r") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(versions_dir, name)
+    return path if name and os.path.exists(path) else None
+
+
+def publish_snapshot(vector_db, versions_dir: Optional[str] = None,
+                     keep: int = INDEX_KEEP_VERSIONS, codec_name: str = VECTOR_CODEC) -> str:
+    """Export a new immutable version and atomically make it CURRENT."""
+    versions_dir = versions_dir or vector_db.versions_dir
+    os.makedirs(versions_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    name = f"index-{stamp}{SNAPSHOT_SUFFIX}"
+    path = os.path.join(versions_dir, name)
+    export_snapshot(vector_db, path, codec_name=codec_name)
+
+    # Flip the pointer with a rename so readers see either the old or new name
+    pointer = os.path.join(versions_dir, CURRENT_FILE)
+    tmp_pointer = pointer + ".tmp"
+    with open(tmp_pointer, "w") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_pointer, pointer)
+    logger.info(f"✓ Published index version {name}")
+
+    _prune_versions(versions_dir, keep=keep, current=name)
+    return path
+
+
+def _prune_versions(versions_dir: str, keep: int, current: str) -> None:
+    # Replicas may still have an older version mapped; unlinking is safe on
+    # POSIX (the mapping stays valid), so keep only the last few on disk
+    versions = sorted(glob(os.path.join(versions_dir, f"index-*{SNAPSHOT_SUFFIX}")))
+    for path in versions[:-max(keep, 1)]:
+        if os.path.basename(path) == current:
+            continue
+        try:
+            os.remove(path)
+            if os.path.exists(path + RESCORE_SUFFIX):
+                os.remove(path + RESCORE_SUFFIX)
+            logger.info(f"  Removed old index version {os.path.basename(path)}")
+        except OSError as e:
+            logger.warning(f"Could not remove old index version {path}: {e}")
+
+
+# Serving side
+class SnapshotIndex:
+    """Read-only, memory-mapped view of a snapshot file.
+
+    Use open_snapshot to share one instance per file across the process.
+    """
+
+    def __init__(self, path: str, expected_model: str = EMBEDDING_MODEL):
+        self.path = path
+        self.header, data_offset = read_snapshot_header(path)
+        check_embedding_model(self.header, expected_model)
+
+        self.count = self.header["count"]
+        self.dim = self.header["dim"]
+        self.shard_names: List[str] = self.header["shards"]
+        self.indexed_files: List[str] = self.header["indexed_files"]
+        self._lock = threading.Lock()
+
+        sections = self.header["sections"]
+        self.text_offsets = self._map(data_offset, sections["text_offsets"], np.uint64, (self.count + 1,))
+        self._texts = self._map(data_offset, sections["texts"], np.uint8, (sections["texts"][1],))
+
+        # Ids, metadata and the shard column
+        self.id_offsets = self._map(data_offset, sections["id_offsets"], np.uint64, (self.count + 1,))
+        self._ids = self._map(data_offset, sections["ids"], np.uint8, (sections["ids"][1],))
+        self._id_order = self._map(data_offset, sections["id_order"], np.int64, (self.count,))
+        self.metadata_offsets = self._map(data_offset, sections["metadata_offsets"], np.uint64, (self.count + 1,))
+        self._metadata = self._map(data_offset, sections["metadata"], np.uint8, (sections["metadata"][1],))
+        self._shard_column = self._map(data_offset, sections["shard_column"], np.uint16, (self.count,))
+        self._metadatas: Optional[List[Dict]] = None
+        self._shard_rows: Dict[str, np.ndarray] = {}
+
+        # Codes scanned by every query; float16 codes are the vectors themselves
+        codec_config = self.header["codec"]
+        self.codec: VectorCodec = Float16Codec()
+        if codec_config["name"] != Float16Codec.name and self.count:
+            param_bytes = sections["codec_params"][1]
+            params = self._map(data_offset, sections["codec_params"], np.float32, (param_bytes // 4,))
+            self.codec = load_codec(codec_config, np.array(params), self.dim)
+        self.codes = self._map(
+            data_offset, sections["codes"], self.codec.code_dtype,
+            (self.count,) + self.codec.code_shape(self.dim)
+        )
+
+        # float16 rows for exact scores: compressed codecs read them from the
+        # side file, and only for the re-scored candidates
+        self.vectors = self.codes
+        self.rescore_path: Optional[str] = None
+        if self.codec.needs_rescoring:
+            self.rescore_path = os.path.join(os.path.dirname(path), self.header["rescore_file"])
+            expected = self.count * self.dim * np.dtype(np.float16).itemsize
+            if not os.path.exists(self.rescore_path) or os.path.getsize(self.rescore_path) != expected:
+                raise ValueError(f"Missing or incomplete re-scoring rows for {path}: {self.rescore_path}")
+            self.vectors = np.memmap(self.rescore_path, dtype=np.float16, mode="r", shape=(self.count, self.dim))
+
+        logger.info(
+            f"✓ Snapshot mapped: {path} ({self.count} chunks, {self.codec.name}, "
+            f"model {self.header['embedding_model']})"
+        )
+
+    def _map(self, data_offset: int, section: List[int], dtype, shape) -> np.ndarray:
+        start, size = section
+        if size == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=data_offset + start, shape=shape)
+
+    @staticmethod
+    def _blob(data: np.ndarray, offsets: np.ndarray, row: int) -> bytes:
+        return data[int(offsets[row]):int(offsets[row + 1])].tobytes()
+
+    def id_at(self, row: int) -> str:
+        return self._blob(self._ids, self.id_offsets, row).decode("utf-8")
+
+    def metadata_at(self, row: int) -> Dict:
+        return json.loads(self._blob(self._metadata, self.metadata_offsets, row))
+
+    def row_of(self, chunk_id: str) -> Optional[int]:
+        """Row of a chunk id, or None. Binary search over the mapped id order."""
+        key = chunk_id.encode("utf-8")
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._blob(self._ids, self.id_offsets, int(self._id_order[middle])) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count:
+            row = int(self._id_order[low])
+            if self._blob(self._ids, self.id_offsets, row) == key:
+                return row
+        return None
+
+    def _all_metadatas(self) -> List[Dict]:
+        # Filtered scans need every row's metadata: decoded once, on first use
+        with self._lock:
+            if self._metadatas is None:
+                self._metadatas = [self.metadata_at(row) for row in range(self.count)]
+            return self._metadatas
+
+    def _rows_of_shard(self, shard: str) -> np.ndarray:
+        rows = self._shard_rows.get(shard)
+        if rows is None:
+            if shard not in self.shard_names:
+                return np.zeros(0, dtype=np.int64)
+            rows = np.flatnonzero(self._shard_column == self.shard_names.index(shard)).astype(np.int64)
+            self._shard_rows[shard] = rows
+        return rows
+
+    @staticmethod
+    def _check_filter(filter: Dict) -> None:
+        """Raise ValueError for where clauses outside the supported subset.
+
+        Anything else would be evaluated differently than Chroma evaluates it.
+        """
+        for key, condition in filter.items():
+            if key == "$and":
+                for clause in condition:
+                    SnapshotIndex._check_filter(clause)
+            elif key.startswith("$"):
+                raise ValueError(f"Unsupported filter operator '{key}' (snapshots support $and, $eq and $in)")
+            elif isinstance(condition, dict):
+                unsupported = [op for op in condition if op not in _FILTER_OPERATORS]
+                if unsupported:
+                    raise ValueError(
+                        f"Unsupported filter operator(s) {unsupported} on '{key}' "
+                        f"(snapshots support equality, $eq and $in)"
+                    )
+
+    @staticmethod
+    def _matches(metadata: Dict, filter: Dict) -> bool:
+        # Subset of Chroma's where syntax: equality, $eq, $in and $and
+        for key, condition in filter.items():
+            if key == "$and":
+                if not all(SnapshotIndex._matches(metadata, c) for c in condition):
+                    return False
+            elif key.startswith("$"):
+                raise ValueError(f"Unsupported filter operator '{key}' (snapshots support $and, $eq and $in)")
+            elif isinstance(condition, dict):
+                for op, value in condition.items():
+                    if op == "$eq":
+                        if metadata.get(key) != value:
+                            return False
+                    elif op == "$in":
+                        if metadata.get(key) not in value:
+                            return False
+                    else:
+                        raise ValueError(f"Unsupported filter operator '{op}' (snapshots support $eq and $in)")
+            elif metadata.get(key) != condition:
+                return False
+        return True
+
+    def _candidate_rows(self, filter: Optional[Dict], shards: Optional[List[str]]) -> Optional[np.ndarray]:
+        rows = None
+        if shards and set(shards) != set(self.shard_names):
+            rows = np.concatenate([self._rows_of_shard(s) for s in shards])
+        if filter:
+            # Validate up front: a short-circuited clause would otherwise go unchecked
+            self._check_filter(filter)
+            metadatas = self._all_metadatas()
+            pool = range(self.count) if rows is None else rows
+            rows = np.array([r for r in pool if self._matches(metadatas[r], filter)], dtype=np.int64)
+        return rows
+
+    def score(self, query_embedding: List[float], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Exact cosine scores (vectors are normalized) for all rows or the given rows."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if rows is not None:
+            return self.vectors[rows].astype(np.float32) @ query
+        # Score in blocks so only a slice of the mapping is upcast at a time
+        return np.concatenate([
+            self.vectors[i:i + _SCORE_BLOCK_ROWS].astype(np.float32) @ query
+            for i in range(0, self.count, _SCORE_BLOCK_ROWS)
+        ]) if self.count else np.zeros(0, dtype=np.float32)
+
+    def approximate_score(self, query_embedding: List[float], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Scores from the compressed codes."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if rows is not None:
+            return self.codec.score(self.codes[rows], query)
+        return np.concatenate([
+            self.codec.score(self.codes[i:i + _SCORE_BLOCK_ROWS], query)
+            for i in range(0, self.count, _SCORE_BLOCK_ROWS)
+        ]) if self.count else np.zeros(0, dtype=np.float32)
+
+    @staticmethod
+    def _top(scores: np.ndarray, k: int) -> np.ndarray:
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def search(
+        self,
+        query_embedding: List[float],
+        top_k: int = 3,
+        filter: Optional[Dict] = None,
+        shards: Optional[List[str]] = None
+    ) -> List[Tuple[str, float, Dict]]:
+        """Top_k search. Returns (id, score, metadata) tuples, best first.
+
+        Scores are always exact: compressed codecs only pick the candidates.
+        """
+        rows = self._candidate_rows(filter, shards)
+        if self.count == 0 or (rows is not None and len(rows) == 0):
+            return []
+        if rows is None:
+            rows = np.arange(self.count)
+        full_scan = len(rows) == self.count
+
+        if self.codec.needs_rescoring:
+            approx = self.approximate_score(query_embedding, None if full_scan else rows)
+            candidates = rows[self._top(approx, max(top_k * RESCORE_FACTOR, RESCORE_MIN_CANDIDATES))]
+            candidates.sort()  # sequential reads from the float16 mapping
+            scores = self.score(query_embedding, candidates)
+            rows = candidates
+        else:
+            scores = self.score(query_embedding, None if full_scan else rows)
+
+        return [
+            (self.id_at(int(rows[i])), float(scores[i]), self.metadata_at(int(rows[i])))
+            for i in self._top(scores, top_k)
+        ]
+
+    def get_texts(self, ids: List[str]) -> Dict[str, str]:
+        texts = {}
+        for chunk_id in ids:
+            row = self.row_of(chunk_id)
+            if row is None:
+                continue
+            start, end = int(self.text_offsets[row]), int(self.text_offsets[row + 1])
+            texts[chunk_id] = zlib.decompress(self._texts[start:end].tobytes()).decode("utf-8")
+        return texts
+
+    def shard_counts(self) -> Dict[str, int]:
+        counts = np.bincount(self._shard_column, minlength=len(self.shard_names) + 1)
+        return {shard: int(counts[i]) for i, shard in enumerate(self.shard_names)}
+
+    def size_bytes(self) -> int:
+        """Size of the snapshot file (what queries scan), without the re-scoring rows."""
+        return os.path.getsize(self.path)
+
+    def rescore_size_bytes(self) -> int:
+        return os.path.getsize(self.rescore_path) if self.rescore_path else 0
+
+
+# One mapping per snapshot file, shared by every RagSystem (Streamlit session)
+_OPEN_SNAPSHOTS: "weakref.WeakValueDictionary" = weakref.WeakValueDictionary()
+_OPEN_SNAPSHOTS_LOCK = threading.Lock()
+
+
+def open_snapshot(path: str, expected_model: str = EMBEDDING_MODEL) -> SnapshotIndex:
+    """Shared SnapshotIndex for a file, mapped on first use.
+
+    Keyed by file identity, so a snapshot replaced in place is mapped again.
+    Unused instances are dropped once no VectorDB holds them.
+    """
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_ino, stat.st_mtime_ns)
+    with _OPEN_SNAPSHOTS_LOCK:
+        index = _OPEN_SNAPSHOTS.get(key)
+        if index is None:
+            index = SnapshotIndex(path, expected_model=expected_model)
+            _OPEN_SNAPSHOTS[key] = index
+    check_embedding_model(index.header, expected_model)
+    return index
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Export, import or inspect index snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export", help="Write the current index to a snapshot file")
+    export_parser.add_argument("output", help=f"Snapshot path (e.g. index{SNAPSHOT_SUFFIX})")
+    export_parser.add_argument("--persist-directory", default=PERSIST_DIRECTORY)
+    export_parser.add_argument("--codec", default=VECTOR_CODEC, help="float16, int8 or pq")
+
+    import_parser = sub.add_parser("import", help="Validate a snapshot and install it for serving")
+    import_parser.add_argument("snapshot")
+    import_parser.add_argument("--persist-directory", default=PERSIST_DIRECTORY)
+
+    publish_parser = sub.add_parser("publish", help="Publish the current index as a new version for replicas")
+    publish_parser.add_argument("--persist-directory", default=PERSIST_DIRECTORY)
+    publish_parser.add_argument("--versions-dir", help="Default: INDEX_VERSIONS_DIR or <persist-directory>/versions")
+    publish_parser.add_argument("--codec", default=VECTOR_CODEC, help="float16, int8 or pq")
+
+    inspect_parser = sub.add_parser("inspect", help="Print a snapshot manifest summary")
+    inspect_parser.add_argument("snapshot")
+
+    args = parser.parse_args(argv)
+
+    if args.command in ("export", "publish"):
+        from .rag_logic import RagLogic
+        from .vector_db import VectorDB
+        vector_db = VectorDB(
+            rag_logic=RagLogic(),
+            persist_directory=args.persist_directory,
+            versions_dir=getattr(args, "versions_dir", None)
+        )
+        if args.command == "export":
+            info = export_snapshot(vector_db, args.output, codec_name=args.codec)
+            print(json.dumps(info, indent=2))
+        else:
+            print(f"Published {publish_snapshot(vector_db, codec_name=args.codec)}")
+    elif args.command == "import":
+        target = import_snapshot(args.snapshot, persist_directory=args.persist_directory)
+        print(f"Installed {target}\nServe it with INDEX_SNAPSHOT={target}")
+    else:
+        header, _ = read_snapshot_header(args.snapshot)
+        summary = {k: v for k, v in header.items() if k != "indexed_files"}
+        summary["indexed_files"] = len(header["indexed_files"])
+        print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+import numpy as np
+from .config import PQ_SUBVECTORS
+
+logger = logging.getLogger(__name__)
+
+'''
+Compressed vector codes for snapshot serving.
+
+A codec turns float32 embeddings into compact codes and scores a query
+against those codes approximately. The snapshot file holds the codes (the
+part that is scanned for every query); for int8 and pq the float16 vectors
+go to a side file that is only read for the small candidate set that gets
+re-scored exactly.
+
+- float16: 2 bytes/dim, exact enough to skip re-scoring
+- int8:    1 byte/dim, symmetric per-dimension scalar quantization
+- pq:      1 byte per sub-vector, product quantization (256 centroids each)
+'''
+
+
+class VectorCodec(ABC):
+    name = "base"
+    code_dtype = np.float16
+
+    def fit(self, vectors: np.ndarray) -> "VectorCodec":
+        return self
+
+    def code_shape(self, dim: int) -> Tuple[int, ...]:
+        return (dim,)
+
+    @abstractmethod
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        ...
+
+    @abstractmethod
+    def score(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate inner-product scores of query against codes."""
+
+    def config(self) -> Dict:
+        return {"name": self.name}
+
+    def params(self) -> np.ndarray:
+        """Learned parameters, flattened to float32 for storage."""
+        return np.zeros(0, dtype=np.float32)
+
+    def load_params(self, config: Dict, params: np.ndarray, dim: int) -> "VectorCodec":
+        return self
+
+    @property
+    def needs_rescoring(self) -> bool:
+        return True
+
+
+class Float16Codec(VectorCodec):
+    name = "float16"
+    code_dtype = np.float16
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float16)
+
+    def score(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) @ query
+
+    @property
+    def needs_rescoring(self) -> bool:
+        return False
+
+
+class Int8Codec(VectorCodec):
+    name = "int8"
+    code_dtype = np.int8
+
+    def __init__(self):
+        self.scale: Optional[np.ndarray] = None
+
+    def fit(self, vectors: np.ndarray) -> "Int8Codec":
+        self.scale = np.maximum(np.abs(vectors).max(axis=0), 1e-12).astype(np.float32) / 127.0
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def score(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # Fold the scale into the query instead of decoding every row
+        return codes.astype(np.float32) @ (query * self.scale)
+
+    def params(self) -> np.ndarray:
+        return self.scale.astype(np.float32)
+
+    def load_params(self, config: Dict, params: np.ndarray, dim: int) -> "Int8Codec":
+        self.scale = np.asarray(params, dtype=np.float32).reshape(dim)
+        return self
+
+
+class PQCodec(VectorCodec):
+    name = "pq"
+    code_dtype = np.uint8
+
+    def __init__(self, subvectors: int = PQ_SUBVECTORS, ksub: int = 256,
+                 iterations: int = 20, sample_size: int = 50000, seed: int = 0):
+        self.m = subvectors
+        self.ksub = ksub
+        self.iterations = iterations
+        self.sample_size = sample_size
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None  # [m, ksub, dsub]
+
+    def code_shape(self, dim: int) -> Tuple[int, ...]:
+        return (self.m,)
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        n, dim = vectors.shape
+        return vectors.reshape(n, self.m, dim // self.m)
+
+    @staticmethod
+    def _assign(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # argmin ||x - c||^2 = argmin (||c||^2 - 2 x.c)
+        distances = (centroids ** 2).sum(axis=1)[None, :] - 2 * points @ centroids.T
+        return distances.argmin(axis=1)
+
+    def fit(self, vectors: np.ndarray) -> "PQCodec":
+        n, dim = vectors.shape
+        if dim % self.m:
+            raise ValueError(f"PQ needs dim ({dim}) divisible by PQ_SUBVECTORS ({self.m})")
+
+        rng = np.random.default_rng(self.seed)
+        sample = vectors if n <= self.sample_size else vectors[rng.choice(n, self.sample_size, replace=False)]
+        sample = self._split(np.asarray(sample, dtype=np.float32))
+        self.ksub = min(self.ksub, len(sample))
+
+        centroids = np.zeros((self.m, self.ksub, dim // self.m), dtype=np.float32)
+        for j in range(self.m):
+            points = sample[:, j, :]
+            centers = points[rng.choice(len(points), self.ksub, replace=False)].copy()
+            for _ in range(self.iterations):
+                labels = self._assign(points, centers)
+                counts = np.bincount(labels, minlength=self.ksub)
+                sums = np.zeros_like(centers)
+                np.add.at(sums, labels, points)
+                filled = counts > 0
+                centers[filled] = sums[filled] / counts[filled, None]
+                # Re-seed empty clusters from random points
+                empty = np.flatnonzero(~filled)
+                if len(empty):
+                    centers[empty] = points[rng.choice(len(points), len(empty))]
+            centroids[j] = centers
+        self.centroids = centroids
+        logger.info(f"✓ PQ trained: {self.m} sub-vectors x {self.ksub} centroids on {len(sample)} vectors")
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        parts = self._split(np.asarray(vectors, dtype=np.float32))
+        codes = np.zeros((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = self._assign(parts[:, j, :], self.centroids[j])
+        return codes
+
+    def score(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # Asymmetric distance: one lookup table per query, then gather + sum
+        table = np.einsum("mkd,md->mk", self.centroids, query.reshape(self.m, -1))
+        return table[np.arange(self.m)[None, :], codes].sum(axis=1)
+
+    def config(self) -> Dict:
+        return {"name": self.name, "m": self.m, "ksub": self.ksub}
+
+    def params(self) -> np.ndarray:
+        return self.centroids.astype(np.float32).ravel()
+
+    def load_params(self, config: Dict, params: np.ndarray, dim: int) -> "PQCodec":
+        self.m = config["m"]
+        self.ksub = config["ksub"]
+        self.centroids = np.asarray(params, dtype=np.float32).reshape(self.m, self.ksub, dim // self.m)
+        return self
+
+
+_CODECS = {
+    Float16Codec.name: Float16Codec,
+    Int8Codec.name: Int8Codec,
+    PQCodec.name: PQCodec
+}
+
+
+def get_codec(name: str) -> VectorCodec:
+    if name not in _CODECS:
+        raise ValueError(f"Unknown vector codec '{name}' (expected one of {sorted(_CODECS)})")
+    return _CODECS[name]()
+
+
+def load_codec(config: Dict, params: np.ndarray, dim: int) -> VectorCodec:
+    return get_codec(config["name"]).load_params(config, params, dim)
@@ -1,40 +1,195 @@
 import os
 import json
+import time
+import uuid
+import hashlib
 import logging
+import weakref
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
 from .rag_logic import RagLogic
-from .config import PERSIST_DIRECTORY
+from .chunk_store import ChunkStore
+from .document_loader import find_files, document_loader, load_parsed, DIGEST_KEY, PARSER_KEY
+from .parse_cache import file_digest
+from .profiling import profiler
+from .snapshot import SnapshotIndex, open_snapshot, current_snapshot_path, publish_snapshot, versions_dir_for
+from .config import (
+    PERSIST_DIRECTORY,
+    COLLECTION_NAME,
+    SHARD_NAMES,
+    SHARD_COUNT,
+    SHARD_KEY,
+    SEARCH_WORKERS,
+    INDEX_RELOAD_INTERVAL,
+    INDEX_PUBLISH_DELAY,
+    HNSW_SPACE,
+    HNSW_CONSTRUCTION_EF,
+    HNSW_M,
+    HNSW_SEARCH_EF
+)
+import chromadb
 from langchain_community.vectorstores import Chroma
 from langchain_community.vectorstores.utils import filter_complex_metadata
 from langchain_core.documents import Document
-from typing import List, Optional, Dict
+from typing import Iterator, List, Optional, Dict, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Metadata carried on search hits; everything else stays in the index
+COMPACT_METADATA_KEYS = ("source", "filename", "page", "chunk_id", "shard")
+
+# Chroma's limit per call; used for paged reads and batched writes
+CHROMA_BATCH_SIZE = 5000
+
+# Collections built next to a live one (rebuild, reindex) and swapped in when complete
+REPLACEMENT_SUFFIXES = ("_rebuild", "_reindex")
+
+
+@dataclass
+class SearchHit:
+    """Lightweight search result. Text is hydrated from the chunk store on demand."""
+    id: str
+    score: float
+    metadata: Dict = field(default_factory=dict)
+
+    @property
+    def shard(self) -> Optional[str]:
+        return self.metadata.get("shard")
+
+
+def apply_relevance_cutoff(
+    hits: List[SearchHit],
+    min_score: float,
+    max_drop: float,
+    min_k: int = 1
+) -> List[SearchHit]:
+    """Trim score-sorted hits to the relevant prefix.
+
+    Hits below min_score are never kept. After the first min_k hits, stop at
+    the first gap between consecutive scores larger than max_drop.
+    """
+    kept: List[SearchHit] = []
+    for hit in hits:
+        if hit.score < min_score:
+            break
+        if len(kept) >= min_k and kept[-1].score - hit.score > max_drop:
+            break
+        kept.append(hit)
+    return kept
+
+
+def _iter_collection(collection, include: List[str]) -> Iterator[Dict]:
+    """Pages of a Chroma collection ({"ids": [...], <include>: [...]}) in CHROMA_BATCH_SIZE steps."""
+    offset = 0
+    while True:
+        page = collection.get(include=include, limit=CHROMA_BATCH_SIZE, offset=offset)
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+
+# Shorter matches between neighbouring chunks are taken as chance, not overlap
+MIN_STITCH_OVERLAP = 8
+
+
+def _stitch(texts: List[str]) -> str:
+    """Join consecutive chunks of one document, dropping the text they overlap on."""
+    text = texts[0]
+    for chunk in texts[1:]:
+        tail = text[-len(chunk):]
+        head = chunk[:MIN_STITCH_OVERLAP]
+        overlap = 0
+        # Earliest start in the tail from which the rest is a prefix of the chunk
+        position = tail.find(head)
+        while position != -1:
+            if chunk.startswith(tail[position:]):
+                overlap = len(tail) - position
+                break
+            position = tail.find(head, position + 1)
+        text += chunk[overlap:] if overlap else "\n" + chunk
+    return text
+
+
 '''
-1. Load or create persistent vector store
+1. Load or create persistent vector store (one collection per shard)
 2. load chunks from RagLogic
-3. Add new document chunks to vector store
+3. Route new document chunks to their shard; vectors go to Chroma, text to the chunk store
 4. Save vector store
-5. Perform semantic similarity search on query
-6. Return relevant document chunks
+5. Perform semantic similarity search on query across shards in parallel
+6. Merge and return lightweight hits, hydrating text only when asked
 '''
 class VectorDB:
 
     # Initialize VectorDB with RagLogic instance
-    def __init__(self, rag_logic: RagLogic, persist_directory: str = PERSIST_DIRECTORY):
+    def __init__(
+        self,
+        rag_logic: RagLogic,
+        persist_directory: str = PERSIST_DIRECTORY,
+        shard_names: Optional[List[str]] = None,
+        snapshot_path: Optional[str] = None,
+        read_only: bool = False,
+        versions_dir: Optional[str] = None
+    ):
         self.rag_logic = rag_logic
         self.persist_directory = persist_directory
         self.vector_store = None
+        self.shards: Dict[str, Chroma] = {}
+        # Distance space per shard (a collection keeps its space until rebuilt)
+        self._spaces: Dict[str, str] = {}
+        self.snapshot: Optional[SnapshotIndex] = None
+        self._previous_snapshot: Optional[SnapshotIndex] = None
+        self.chunk_store: Optional[ChunkStore] = None
+        self.shard_names = shard_names or SHARD_NAMES or [f"shard_{i}" for i in range(SHARD_COUNT)]
         self.indexed_files_path = os.path.join(persist_directory, "indexed_files.json")
+        self.indexed_files = set()
+        self.versions_dir = versions_dir or versions_dir_for(persist_directory)
+        self._read_only = bool(snapshot_path) or read_only
+        self._swap_lock = threading.Lock()
+        self._stop_watcher = threading.Event()
+        self._watcher = None
+        # Debounced background publishing (ingestion side)
+        self._publish_lock = threading.Lock()
+        self._publish_due: Optional[float] = None
+        self._publisher: Optional[threading.Thread] = None
+
+        if snapshot_path:
+            # Serve a prebuilt snapshot: memory-mapped, read-only, nothing rebuilt
+            self.load_snapshot(snapshot_path)
+        elif read_only:
+            # Replica: serve the published version and follow newer ones
+            self.reload_if_updated()
+            self._start_version_watcher()
+        else:
+            # Create persist directory if needed
+            os.makedirs(persist_directory, exist_ok=True)
+
+            # Compressed chunk text lives outside the vector index
+            self.chunk_store = ChunkStore(os.path.join(persist_directory, "chunk_store.sqlite"))
+            
+            # Load indexed files from disk
+            self.indexed_files = self._load_indexed_files()
+
+        # Thread pool for shard fan-out (not needed for a single shard)
+        self._executor = None
+        if len(self.shard_names) > 1:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, min(SEARCH_WORKERS, len(self.shard_names))),
+                thread_name_prefix="vector-shard"
+            )
         
-        # Create persist directory if needed
-        os.makedirs(persist_directory, exist_ok=True)
-        
-        # Load indexed files from disk
-        self.indexed_files = self._load_indexed_files()
-        
-        self.load_vector_store()
+        if not self._read_only:
+            self.load_vector_store()
         logger.info(f"✓ VectorDB initialized with persist directory: {persist_directory}")
+
+    @property
+    def read_only(self) -> bool:
+        return self._read_only
+
+    def is_ready(self) -> bool:
+        """True when there is an index to search (Chroma shards or a snapshot)."""
+        return bool(self.shards) or self.snapshot is not None
     
     def _load_indexed_files(self) -> set:
         if os.path.exists(self.indexed_files_path):
@@ -57,19 +212,134 @@ class VectorDB:
         except Exception as e:
             logger.error(f"Could not save indexed files: {e}")
     
+    # Shard naming and routing
+    def _collection_name(self, shard: str) -> str:
+        # A single shard keeps the original collection so existing indexes still load
+        if len(self.shard_names) == 1:
+            return COLLECTION_NAME
+        return f"{COLLECTION_NAME}_{shard}"
+
+    def shard_for(self, metadata: Dict) -> str:
+        """Pick the shard a chunk belongs to.
+
+        An explicit "shard" entry wins, then a SHARD_KEY value naming a shard
+        (document group / tenant), otherwise a stable hash of the SHARD_KEY value.
+        An explicit shard that is not configured raises ValueError instead of
+        silently landing in another tenant's shard.
+        """
+        explicit = metadata.get("shard")
+        if explicit:
+            if explicit not in self.shard_names:
+                raise ValueError(f"Unknown shard '{explicit}' (configured: {', '.join(self.shard_names)})")
+            return explicit
+
+        value = metadata.get(SHARD_KEY) or metadata.get("source", "")
+        if value in self.shards:
+            return value
+
+        # A well-mixed hash: CRC32's low bits barely change between similar paths
+        digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest()
+        return self.shard_names[int.from_bytes(digest, "big") % len(self.shard_names)]
+
+    def _resolve_shards(self, shards: Optional[List[str]]) -> List[str]:
+        if not shards:
+            return list(self.shard_names)
+        unknown = [s for s in shards if s not in self.shard_names]
+        if unknown:
+            logger.warning(f"Ignoring unknown shard(s): {unknown}")
+        return [s for s in shards if s in self.shard_names]
+
+    @staticmethod
+    def _distance_to_score(distance: float, space: str = "l2") -> float:
+        # Embeddings are normalized, so every space maps back to cosine
+        # similarity (higher is better): l2 is squared L2 = 2 - 2cos,
+        # cosine and ip distances are 1 - cos
+        if space == "l2":
+            return 1.0 - distance / 2.0
+        return 1.0 - distance
+
+    # HNSW parameters
+    @staticmethod
+    def _hnsw_metadata() -> Dict:
+        """Collection metadata for new (or rebuilt) collections."""
+        metadata = {
+            "hnsw:space": HNSW_SPACE,
+            "hnsw:construction_ef": HNSW_CONSTRUCTION_EF,
+            "hnsw:M": HNSW_M
+        }
+        if HNSW_SEARCH_EF > 0:
+            metadata["hnsw:search_ef"] = HNSW_SEARCH_EF
+        return metadata
+
+    @staticmethod
+    def _collection_hnsw(collection) -> Dict:
+        """The HNSW parameters a collection actually uses."""
+        config = (getattr(collection, "configuration", None) or {}).get("hnsw") or {}
+        metadata = collection.metadata or {}
+        return {
+            "space": config.get("space") or metadata.get("hnsw:space", "l2"),
+            "construction_ef": config.get("ef_construction") or metadata.get("hnsw:construction_ef"),
+            "M": config.get("max_neighbors") or metadata.get("hnsw:M"),
+            "search_ef": config.get("ef_search") or metadata.get("hnsw:search_ef")
+        }
+
+    def hnsw_config(self) -> Dict[str, Dict]:
+        return {shard: self._collection_hnsw(store._collection) for shard, store in self.shards.items()}
+
+    def set_search_ef(self, search_ef: int, shards: Optional[List[str]] = None) -> bool:
+        """Change search ef on the live collections (persists with the collection)."""
+        try:
+            for shard in self._resolve_shards(shards):
+                self.shards[shard]._collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+            logger.info(f"✓ HNSW search ef set to {search_ef}")
+            return True
+        except Exception as e:
+            logger.error(f"✗ Could not set search ef (needs chromadb >= 1.0): {e}")
+            return False
+
     # Create or load Chroma vector store
     def load_vector_store(self) -> Chroma:
-        """Load or create the Chroma vector store."""
+        """Load or create one Chroma collection per shard."""
         try:
-            self.vector_store = Chroma(
-                collection_name="example_collection",
-                embedding_function=self.rag_logic.get_embedding_model(),
-                persist_directory=self.persist_directory
+            embedding_model = self.rag_logic.get_embedding_model()
+            client = chromadb.Client(
+                chromadb.config.Settings(is_persistent=True, persist_directory=self.persist_directory)
             )
+            for shard in self.shard_names:
+                # Before opening: a missing collection would be created empty
+                for suffix in REPLACEMENT_SUFFIXES:
+                    self._finish_replacement(client, self._collection_name(shard), suffix)
+
+                self.shards[shard] = Chroma(
+                    collection_name=self._collection_name(shard),
+                    embedding_function=embedding_model,
+                    client=client,
+                    persist_directory=self.persist_directory,
+                    collection_metadata=self._hnsw_metadata()
+                )
+
+                # Existing collections keep the parameters they were built with
+                hnsw = self._collection_hnsw(self.shards[shard]._collection)
+                self._spaces[shard] = hnsw["space"]
+                built_with = (hnsw["space"], hnsw["construction_ef"], hnsw["M"])
+                if built_with != (HNSW_SPACE, HNSW_CONSTRUCTION_EF, HNSW_M):
+                    logger.warning(
+                        f"{shard} was built with space/construction_ef/M={built_with}; "
+                        f"run 'python -m core.index_maintenance rebuild' to apply the configured values"
+                    )
+
+            if HNSW_SEARCH_EF > 0:
+                stale = [s for s, h in self.hnsw_config().items() if h["search_ef"] != HNSW_SEARCH_EF]
+                if stale:
+                    self.set_search_ef(HNSW_SEARCH_EF, stale)
+
+            # First shard doubles as the default store
+            self.vector_store = self.shards[self.shard_names[0]]
+
             # Check if it loaded successfully
             try:
-                count = self.vector_store._collection.count()
-                logger.info(f"✓ Vector store ready with {count} existing chunks")
+                count = sum(store._collection.count() for store in self.shards.values())
+                logger.info(f"✓ Vector store ready with {count} existing chunks in {len(self.shards)} shard(s)")
             except:
                 logger.info("✓ Vector store ready (new database)")
                 
@@ -77,36 +347,180 @@ class VectorDB:
         
         except Exception as e:
             logger.error(f"✗ Error loading vector store: {e}")
+
+    def load_snapshot(self, snapshot_path: str) -> SnapshotIndex:
+        """Memory-map a snapshot (shared per process). Raises ValueError if it was built with another embedding model."""
+        snapshot = open_snapshot(snapshot_path, expected_model=self.rag_logic.model_name)
+        self._swap_snapshot(snapshot)
+        return snapshot
+
+    def _swap_snapshot(self, snapshot: SnapshotIndex) -> None:
+        # Searches read self.snapshot once, so in-flight requests finish on the
+        # version they started with; the previous one is kept for hydration
+        with self._swap_lock:
+            self._previous_snapshot = self.snapshot
+            self.shard_names = list(snapshot.shard_names) or self.shard_names
+            self.indexed_files = set(snapshot.indexed_files)
+            self.snapshot = snapshot
+
+    # Read-only replicas: follow published index versions
+    def reload_if_updated(self) -> bool:
+        """Swap to the newest published version if it changed. Returns True on swap."""
+        path = current_snapshot_path(self.versions_dir)
+        if not path:
+            if not self.snapshot:
+                logger.warning(f"No published index version in {self.versions_dir} yet")
+            return False
+        if self.snapshot and os.path.abspath(self.snapshot.path) == os.path.abspath(path):
+            return False
+
+        try:
+            # Map the new version fully before swapping it in
+            self.load_snapshot(path)
+            logger.info(f"✓ Serving index version {os.path.basename(path)}")
+            return True
+        except Exception as e:
+            logger.error(f"✗ Could not load index version {path}: {e}")
+            return False
+
+    def _start_version_watcher(self) -> None:
+        # The thread only holds a weak reference: a replica nobody uses any more
+        # is collected even without close(), and collecting it stops the thread
+        ref = weakref.ref(self)
+        stop = self._stop_watcher
+
+        def watch():
+            while not stop.wait(INDEX_RELOAD_INTERVAL):
+                vector_db = ref()
+                if vector_db is None:
+                    return
+                vector_db.reload_if_updated()
+                del vector_db
+
+        weakref.finalize(self, stop.set)
+        self._watcher = threading.Thread(target=watch, name="index-version-watcher", daemon=True)
+        self._watcher.start()
+
+    def close(self) -> None:
+        """Stop background work (version watcher, shard pool); a pending publish runs now."""
+        self._stop_watcher.set()
+        publisher = self._publisher
+        if publisher:
+            publisher.join()
+        if self._executor:
+            self._executor.shutdown(wait=False)
+
+    def publish_version(self, versions_dir: Optional[str] = None) -> Optional[str]:
+        """Ingestion side: publish the current index as a new version for replicas."""
+        if self.read_only:
+            logger.error("✗ Read-only VectorDB cannot publish index versions")
+            return None
+        try:
+            return publish_snapshot(self, versions_dir or self.versions_dir)
+        except Exception as e:
+            logger.error(f"✗ Error publishing index version: {e}")
+            return None
+
+    def schedule_publish(self, delay: float = INDEX_PUBLISH_DELAY) -> None:
+        """Publish a version in the background once nothing new arrived for delay seconds.
+
+        A batch of uploads then costs one export instead of one per file.
+        """
+        if self.read_only:
+            return
+        with self._publish_lock:
+            self._publish_due = time.monotonic() + delay
+            if self._publisher is None:
+                # Not a daemon: a pending publish still runs when the process exits
+                self._publisher = threading.Thread(target=self._run_publisher, name="index-publisher")
+                self._publisher.start()
+
+    def _run_publisher(self) -> None:
+        while True:
+            with self._publish_lock:
+                if self._publish_due is None:
+                    self._publisher = None
+                    return
+                wait = self._publish_due - time.monotonic()
+                publish_now = wait <= 0 or self._stop_watcher.is_set()
+                if publish_now:
+                    self._publish_due = None
+            if not publish_now:
+                # More uploads push the deadline back; close() cuts the wait short
+                self._stop_watcher.wait(wait)
+                continue
+            self.publish_version()
+
+    def _add_to_shard(self, shard: str, chunks: List[Document], collection=None) -> None:
+        """Add chunks to a single shard (or the given collection) in batches.
+
+        Text goes to the chunk store; Chroma only gets ids, embeddings and metadata.
+        """
+        if collection is None:
+            collection = self.shards[shard]._collection
+
+        total_chunks = len(chunks)
+        num_batches = (total_chunks + CHROMA_BATCH_SIZE - 1) // CHROMA_BATCH_SIZE
+
+        logger.info(f"Adding {total_chunks} chunks to {shard} in {num_batches} batch(es)...")
+
+        for i in range(0, total_chunks, CHROMA_BATCH_SIZE):
+            batch = chunks[i:i + CHROMA_BATCH_SIZE]
+            batch_num = i // CHROMA_BATCH_SIZE + 1
+
+            logger.info(f"  [{shard}] Processing batch {batch_num}/{num_batches} ({len(batch)} chunks)")
+
+            ids = [uuid.uuid4().hex for _ in batch]
+            texts = [chunk.page_content for chunk in batch]
+
+            # Store text first so every indexed vector can be hydrated
+            self.chunk_store.put_many(zip(ids, texts))
+
+            embeddings = self.rag_logic.get_embedding_model().embed_documents(texts)
+            collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                metadatas=[chunk.metadata for chunk in batch]
+            )
     
     # Add document chunks to vector store
     def add_documents(self, chunks: List[Document]) -> bool:
-        """Add document chunks to vector store in batches."""
+        """Add document chunks to their shards in batches."""
         if not chunks:
             logger.warning("No chunks to add")
             return False
+
+        if self.read_only:
+            logger.error("✗ Cannot add documents: serving a read-only snapshot")
+            return False
+        
+        if not self.shards:
+            logger.error("Vector store not initialized")
+            return False
     
         try:
             # Filter complex metadata (coordinates, layouts, etc.)
             logger.info("Filtering complex metadata...")
             chunks = filter_complex_metadata(chunks)
             
-            # Chroma batch size limit
-            BATCH_SIZE = 5000
-            
-            # Add in batches
-            total_chunks = len(chunks)
-            num_batches = (total_chunks + BATCH_SIZE - 1) // BATCH_SIZE
-            
-            logger.info(f"Adding {total_chunks} chunks in {num_batches} batch(es)...")
-            
-            for i in range(0, total_chunks, BATCH_SIZE):
-                batch = chunks[i:i + BATCH_SIZE]
-                batch_num = i // BATCH_SIZE + 1
-                
-                logger.info(f"  Processing batch {batch_num}/{num_batches} ({len(batch)} chunks)")
-                
-                # Add batch to vector store
-                self.vector_store.add_documents(batch)
+            # Route chunks to shards
+            by_shard: Dict[str, List[Document]] = {}
+            for chunk in chunks:
+                shard = self.shard_for(chunk.metadata)
+                chunk.metadata["shard"] = shard
+                by_shard.setdefault(shard, []).append(chunk)
+
+            # Shards are independent indexes, so write them in parallel
+            if self._executor and len(by_shard) > 1:
+                futures = [
+                    self._executor.submit(profiler.bind(self._add_to_shard), shard, shard_chunks)
+                    for shard, shard_chunks in by_shard.items()
+                ]
+                for future in futures:
+                    future.result()
+            else:
+                for shard, shard_chunks in by_shard.items():
+                    self._add_to_shard(shard, shard_chunks)
             
             # Track indexed files
             for chunk in chunks:
@@ -117,27 +531,142 @@ class VectorDB:
             # Save indexed files list
             self._save_indexed_files()
             
-            logger.info(f"✓ Successfully added {total_chunks} chunks")
+            logger.info(f"✓ Successfully added {len(chunks)} chunks")
             logger.info(f"  Total indexed files: {len(self.indexed_files)}")
             return True
         
         except Exception as e:
             logger.error(f"✗ Error adding documents: {e}")
             return False
-        
+
+    def _search_shard(
+        self,
+        shard: str,
+        query_embedding: List[float],
+        top_k: int,
+        filter: Optional[Dict]
+    ) -> List[SearchHit]:
+        # Skip documents: hits stay light and text is hydrated separately
+        results = self.shards[shard]._collection.query(
+            query_embeddings=[query_embedding],
+            n_results=top_k,
+            where=filter or None,
+            include=["metadatas", "distances"]
+        )
+        hits = []
+        for chunk_id, metadata, distance in zip(
+            results["ids"][0], results["metadatas"][0], results["distances"][0]
+        ):
+            compact = {k: metadata[k] for k in COMPACT_METADATA_KEYS if k in (metadata or {})}
+            compact["shard"] = shard
+            score = self._distance_to_score(distance, self._spaces.get(shard, "l2"))
+            hits.append(SearchHit(id=chunk_id, score=score, metadata=compact))
+        return hits
+
     # Perform semantic search
-    def search(self, query: str, top_k: int = 3,filter: Optional[Dict] = None) -> List[Document]:
-        """Perform semantic search on the vector store."""
-        if not self.vector_store:
+    def search_hits(
+        self,
+        query: str,
+        top_k: int = 3,
+        filter: Optional[Dict] = None,
+        shards: Optional[List[str]] = None
+    ) -> List[SearchHit]:
+        """Search the selected shards in parallel and merge top_k hits by score."""
+        if not self.is_ready():
             logger.error("Vector store not initialized")
             return []
+
+        targets = self._resolve_shards(shards)
+        if not targets:
+            logger.warning("No shards to search")
+            return []
+
         try:
-            results = self.vector_store.similarity_search(query, k=top_k, filter = filter)
-            logger.info(f"✓ Found {len(results)} results for '{query}'")
+            # Embed once and reuse the vector for every shard
+            query_embedding = self.rag_logic.get_embedding_model().embed_query(query)
+
+            snapshot = self.snapshot
+            if snapshot:
+                results = [
+                    SearchHit(
+                        id=chunk_id,
+                        score=score,
+                        metadata={k: metadata[k] for k in COMPACT_METADATA_KEYS if k in metadata}
+                    )
+                    for chunk_id, score, metadata in snapshot.search(query_embedding, top_k, filter, targets)
+                ]
+            elif self._executor and len(targets) > 1:
+                futures = [
+                    self._executor.submit(profiler.bind(self._search_shard), shard, query_embedding, top_k, filter)
+                    for shard in targets
+                ]
+                results = [hit for future in futures for hit in future.result()]
+            else:
+                results = [
+                    hit for shard in targets
+                    for hit in self._search_shard(shard, query_embedding, top_k, filter)
+                ]
+
+            # Merge: best score first
+            results.sort(key=lambda hit: hit.score, reverse=True)
+            results = results[:top_k]
+
+            logger.info(f"✓ Found {len(results)} results for '{query}' across {len(targets)} shard(s)")
             return results
         except Exception as e:
             logger.error(f"✗ Error during search: {e}")
             return []
+
+    def get_chunk_texts(self, hits: List[SearchHit]) -> Dict[str, str]:
+        """Fetch full text for the given hits as {id: text}."""
+        snapshot, previous = self.snapshot, self._previous_snapshot
+        if snapshot:
+            ids = [hit.id for hit in hits]
+            texts = snapshot.get_texts(ids)
+            # Hits found just before a version swap may only exist in the old version
+            if previous and len(texts) < len(ids):
+                texts.update(previous.get_texts([i for i in ids if i not in texts]))
+            return texts
+        if self.read_only:
+            return {}
+
+        texts = self.chunk_store.get_many([hit.id for hit in hits])
+
+        # Chunks indexed before the chunk store existed keep their text in Chroma
+        missing: Dict[str, List[str]] = {}
+        for hit in hits:
+            if hit.id not in texts and hit.shard in self.shards:
+                missing.setdefault(hit.shard, []).append(hit.id)
+        for shard, ids in missing.items():
+            try:
+                legacy = self.shards[shard]._collection.get(ids=ids, include=["documents"])
+                for chunk_id, text in zip(legacy["ids"], legacy["documents"]):
+                    if text:
+                        texts[chunk_id] = text
+            except Exception as e:
+                logger.error(f"Could not read legacy chunk text from {shard}: {e}")
+        return texts
+
+    def get_chunk_text(self, hit: SearchHit) -> str:
+        return self.get_chunk_texts([hit]).get(hit.id, "")
+
+    def hydrate(self, hits: List[SearchHit]) -> List[Document]:
+        """Turn hits into full Documents (text + compact metadata)."""
+        texts = self.get_chunk_texts(hits)
+        return [
+            Document(page_content=texts.get(hit.id, ""), metadata={**hit.metadata, "id": hit.id})
+            for hit in hits
+        ]
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 3,
+        filter: Optional[Dict] = None,
+        shards: Optional[List[str]] = None
+    ) -> List[Document]:
+        """Perform semantic search on the vector store."""
+        return self.hydrate(self.search_hits(query, top_k, filter, shards))
         
     def is_file_indexed(self, source: str) -> bool:
         """Check if a file has already been indexed."""
@@ -150,23 +679,51 @@ class VectorDB:
     
     def get_stats(self) -> Dict:
         """Get statistics about the vector store."""
-        total_chunks = 0
-        try:
-            if self.vector_store and self.vector_store._collection:
-                total_chunks = self.vector_store._collection.count()  # ADD () here
-        except Exception as e:
-            logger.error(f'Could not get chunk count: {e}')  # Fix the f-string
+        snapshot = self.snapshot
+        if self.read_only:
+            return {
+                "total_files": len(self.indexed_files),
+                "total_chunks": snapshot.count if snapshot else 0,
+                "shards": snapshot.shard_counts() if snapshot else {},
+                "read_only": True,
+                "snapshot": snapshot.path if snapshot else None,
+                "snapshot_bytes": snapshot.size_bytes() if snapshot else 0,
+                "snapshot_rescore_bytes": snapshot.rescore_size_bytes() if snapshot else 0,
+                "indexed_files": self.get_indexed_files(),
+                "persist_directory": self.persist_directory
+            }
+
+        shard_counts = {}
+        for shard, store in self.shards.items():
+            try:
+                shard_counts[shard] = store._collection.count()
+            except Exception as e:
+                logger.error(f'Could not get chunk count for {shard}: {e}')
+                shard_counts[shard] = 0
         return {
             "total_files": len(self.indexed_files),
-            "total_chunks": total_chunks,
+            "total_chunks": sum(shard_counts.values()),
+            "shards": shard_counts,
+            "chunk_store_bytes": self.chunk_store.size_bytes(),
             "indexed_files": self.get_indexed_files(),
             "persist_directory": self.persist_directory
         }
+
+    @staticmethod
+    def _assign_shard(chunks: List[Document], shard: Optional[str]) -> List[Document]:
+        if shard:
+            for chunk in chunks:
+                chunk.metadata["shard"] = shard
+        return chunks
     
     # load process_file from RagLogic and add to vector store
     
-    def process_and_add_file(self, file_path: str) -> bool:
+    def process_and_add_file(self, file_path: str, shard: Optional[str] = None) -> bool:
         """Process a single file and add to vector store."""
+        if self.read_only:
+            logger.error("✗ Cannot add documents: this VectorDB is read-only")
+            return False
+
         # Process file to get chunks
         file_path = os.path.abspath(file_path)
 
@@ -174,16 +731,23 @@ class VectorDB:
             logger.warning(f"Already indexed: {os.path.basename(file_path)}")
             return False
         
-        chunks = self.rag_logic.process_file(file_path)
+        with profiler.request("ingest", file=os.path.basename(file_path)) as trace:
+            with trace.stage("load_split"):
+                chunks = self.rag_logic.process_file(file_path)
 
-        if not chunks:
-            logger.warning(f"No chunks from {file_path}")
-            return False
-        
-        return self.add_documents(chunks)
+            if not chunks:
+                logger.warning(f"No chunks from {file_path}")
+                return False
+            
+            with trace.stage("embed_index"):
+                return self.add_documents(self._assign_shard(chunks, shard))
     
-    def process_and_add_files(self, file_paths: List[str]) -> bool:
+    def process_and_add_files(self, file_paths: List[str], shard: Optional[str] = None) -> bool:
         """Process multiple files and add to vector store."""
+        if self.read_only:
+            logger.error("✗ Cannot add documents: this VectorDB is read-only")
+            return False
+
         file_paths = [os.path.abspath(fp) for fp in file_paths]
         new_files = [fp for fp in file_paths if not self.is_file_indexed(fp)]
         
@@ -192,24 +756,248 @@ class VectorDB:
             return True
         
         logger.info(f"Processing {len(new_files)} new file(s)...")
-        chunks = self.rag_logic.process_files(new_files)
-        return self.add_documents(chunks)
+        with profiler.request("ingest", files=len(new_files)) as trace:
+            with trace.stage("load_split"):
+                chunks = self.rag_logic.process_files(new_files)
+            with trace.stage("embed_index"):
+                return self.add_documents(self._assign_shard(chunks, shard))
     
-    def process_and_add_directory(self, directory_path: str, glob_pattern: str = "**/*.{pdf,docx,doc,txt}") -> None:
+    def process_and_add_directory(self, directory_path: str, glob_pattern: str = "**/*.{pdf,docx,doc,txt}") -> bool:
+        """Process every matching file in a directory that is not indexed yet."""
+        if not os.path.isdir(directory_path):
+            logger.error(f"Directory does not exist: {directory_path}")
+            return False
+
+        file_paths = find_files(directory_path, glob_pattern)
+        if not file_paths:
+            logger.warning(f"No documents found in directory {directory_path}")
+            return False
 
-        documents = self.rag_logic.load_from_directory(directory_path, glob_pattern=glob_pattern)
+        return self.process_and_add_files(file_paths)
 
-        if not documents:
-            logger.warning(f"No documents loaded from directory {directory_path}")
-            return []
-        
-        # Filter out already indexed files
-        new_documents = [doc for doc in documents if not self.is_file_indexed(doc.metadata.get("source", ""))]
+    @staticmethod
+    def _drop_collection(client, name: str) -> None:
+        try:
+            client.delete_collection(name)
+        except Exception:
+            pass
 
-        if not new_documents:
-            logger.info("All files in directory already indexed")
-            return []
-        logger.info(f"Processing {len(new_documents)} new documents from directory...")
+    @staticmethod
+    def _replace_collection(client, name: str, target) -> None:
+        """Give a fully built collection the live collection's name.
+
+        Chroma cannot rename over an existing collection. A crash between the
+        two steps leaves only the replacement; _finish_replacement completes it.
+        """
+        client.delete_collection(name)
+        target.modify(name=name)
+
+    @staticmethod
+    def _finish_replacement(client, name: str, suffix: str) -> bool:
+        """Complete a replacement interrupted after the live collection was deleted."""
+        existing = {getattr(c, "name", c) for c in client.list_collections()}
+        if name in existing or f"{name}{suffix}" not in existing:
+            return False
+        client.get_collection(f"{name}{suffix}").modify(name=name)
+        logger.warning(f"Finished an interrupted swap: {name}{suffix} is now {name}")
+        return True
+
+    # Offline compaction: rewrite collections without dead entries
+    def rebuild_shard(self, shard: str) -> Dict:
+        """Copy a shard into a fresh collection built with the configured HNSW parameters.
+
+        Deleted entries are left behind, and text of chunks from before the
+        chunk store existed moves out of Chroma into the chunk store.
+        """
+        store = self.shards[shard]
+        client = store._client
+        name = self._collection_name(shard)
+        tmp_name = f"{name}_rebuild"
+
+        # A crash during an earlier swap left only the finished copy: keep it.
+        # Otherwise a leftover copy is incomplete and starts over.
+        self._finish_replacement(client, name, "_rebuild")
+        self._drop_collection(client, tmp_name)
+        target = client.create_collection(tmp_name, metadata=self._hnsw_metadata())
+
+        copied, moved_texts = 0, 0
+        for page in _iter_collection(store._collection, ["embeddings", "metadatas", "documents"]):
+            legacy = [(i, d) for i, d in zip(page["ids"], page["documents"]) if d]
+            if legacy:
+                known = self.chunk_store.get_many([i for i, _ in legacy])
+                self.chunk_store.put_many((i, d) for i, d in legacy if i not in known)
+                moved_texts += len(legacy)
+            target.upsert(ids=page["ids"], embeddings=page["embeddings"], metadatas=page["metadatas"])
+            copied += len(page["ids"])
+
+        self._replace_collection(client, name, target)
+        logger.info(f"✓ Rebuilt {shard}: {copied} vectors, {moved_texts} texts moved to the chunk store")
+        return {"vectors": copied, "texts_moved": moved_texts}
+
+    def compact_chunk_store(self) -> int:
+        """Delete chunk texts no collection refers to. Returns how many were removed."""
+        live = set()
+        for store in self.shards.values():
+            for page in _iter_collection(store._collection, []):
+                live.update(page["ids"])
+        orphans = [chunk_id for chunk_id in self.chunk_store.ids() if chunk_id not in live]
+        self.chunk_store.delete_many(orphans)
+        self.chunk_store.vacuum()
+        logger.info(f"✓ Removed {len(orphans)} orphaned chunk text(s)")
+        return len(orphans)
+
+    def rebuild(self, shards: Optional[List[str]] = None) -> Dict:
+        """Rebuild the given shards (default: all) and compact the chunk store."""
+        if self.read_only:
+            raise ValueError("Cannot rebuild: this VectorDB is read-only")
+        results = {shard: self.rebuild_shard(shard) for shard in self._resolve_shards(shards)}
+
+        # Re-open the renamed collections
+        self.shards = {}
+        self.load_vector_store()
+        results["orphaned_texts_removed"] = self.compact_chunk_store()
+        return results
+
+    # Re-chunk and re-embed everything from the text the index already holds
+    def _indexed_sources(self) -> Dict[str, Dict]:
+        """Per indexed file: its shard, content digest, parser tag and chunks as (id, metadata)."""
+        sources: Dict[str, Dict] = {}
+        for shard, store in self.shards.items():
+            for page in _iter_collection(store._collection, ["metadatas"]):
+                for chunk_id, metadata in zip(page["ids"], page["metadatas"]):
+                    metadata = metadata or {}
+                    entry = sources.setdefault(metadata.get("source", ""), {
+                        "shard": shard,
+                        "digest": metadata.get(DIGEST_KEY),
+                        "parser": metadata.get(PARSER_KEY),
+                        "chunks": []
+                    })
+                    entry["chunks"].append((chunk_id, metadata))
+
+        # Tracked files without chunks can only come back from the file itself
+        for source in self.indexed_files - set(sources):
+            sources[source] = {"shard": None, "digest": None, "parser": None, "chunks": []}
+        return sources
+
+    def _documents_from_chunks(self, chunks: List[Tuple[str, Dict]]) -> List[Document]:
+        """Parsed documents rebuilt from indexed chunks.
+
+        Consecutive chunks with the same metadata were split from one document;
+        they are joined again without the text they overlap on.
+        """
+        texts = self.chunk_store.get_many([chunk_id for chunk_id, _ in chunks])
+        if len(texts) < len(chunks):
+            logger.warning(f"  {len(chunks) - len(texts)} chunk text(s) missing from the chunk store")
 
-        chunks = self.rag_logic.split_documents(new_documents)
-        self.add_documents(chunks)
+        documents, run, run_metadata = [], [], None
+        for chunk_id, metadata in sorted(chunks, key=lambda chunk: chunk[1].get("chunk_id", 0)):
+            if chunk_id not in texts:
+                continue
+            base = {k: v for k, v in metadata.items() if k != "chunk_id"}
+            if run and base != run_metadata:
+                documents.append(Document(page_content=_stitch(run), metadata=run_metadata))
+                run = []
+            run_metadata = base
+            run.append(texts[chunk_id])
+        if run:
+            documents.append(Document(page_content=_stitch(run), metadata=run_metadata))
+        return documents
+
+    def _source_documents(self, source: str, entry: Dict) -> Tuple[List[Document], str]:
+        """Parsed documents of one indexed file, and where they came from.
+
+        The parse cache entry recorded at ingest comes first, then the file
+        itself if it is still there unchanged, then the indexed chunk texts.
+        """
+        digest, parser = entry["digest"], entry["parser"]
+        if digest and parser:
+            documents = load_parsed(source, digest, parser)
+            if documents:
+                return documents, "parse cache"
+
+        if source and os.path.exists(source) and (not digest or file_digest(source) == digest):
+            documents = document_loader(source)
+            if documents:
+                return documents, "file"
+
+        return self._documents_from_chunks(entry["chunks"]), "chunk store"
+
+    def reindex(self) -> bool:
+        """Re-chunk and re-embed every indexed file with the current RagLogic settings.
+
+        Files keep their shard. Text comes from what the index already holds
+        (parse cache, else the chunk store), so files deleted since ingest, such
+        as app uploads, are kept. The new chunks go into fresh collections that
+        replace the live ones only once every file is in; on failure the live
+        index is left as it was.
+        """
+        if self.read_only:
+            logger.error("✗ Cannot reindex: this VectorDB is read-only")
+            return False
+        if not self.shards:
+            logger.error("Vector store not initialized")
+            return False
+
+        sources = self._indexed_sources()
+        logger.info(
+            f"Reindexing {len(sources)} file(s) with chunk_size={self.rag_logic.chunk_size}, "
+            f"chunk_overlap={self.rag_logic.chunk_overlap}..."
+        )
+
+        client = self.vector_store._client
+        targets = {}
+        for shard in self.shard_names:
+            tmp_name = f"{self._collection_name(shard)}_reindex"
+            # A crashed earlier reindex may have left its collection
+            self._drop_collection(client, tmp_name)
+            targets[shard] = client.create_collection(tmp_name, metadata=self._hnsw_metadata())
+
+        reindexed, origins = set(), {}
+        try:
+            pending: Dict[str, List[Document]] = {}
+            for source, entry in sorted(sources.items()):
+                documents, origin = self._source_documents(source, entry)
+                if not documents:
+                    logger.warning(f"No text left for {source or 'chunks without a source'}; dropping it")
+                    continue
+                origins[origin] = origins.get(origin, 0) + 1
+
+                for chunk in filter_complex_metadata(self.rag_logic.split_documents(documents)):
+                    if entry["shard"]:
+                        chunk.metadata["shard"] = entry["shard"]
+                    else:
+                        chunk.metadata.pop("shard", None)
+                    shard = self.shard_for(chunk.metadata)
+                    chunk.metadata["shard"] = shard
+                    pending.setdefault(shard, []).append(chunk)
+                if source:
+                    reindexed.add(source)
+
+                for shard, chunks in pending.items():
+                    if len(chunks) >= CHROMA_BATCH_SIZE:
+                        self._add_to_shard(shard, chunks, targets[shard])
+                        pending[shard] = []
+
+            for shard, chunks in pending.items():
+                if chunks:
+                    self._add_to_shard(shard, chunks, targets[shard])
+        except Exception as e:
+            logger.error(f"✗ Reindex failed, the live index is unchanged: {e}")
+            for target in targets.values():
+                self._drop_collection(client, target.name)
+            # Texts of the abandoned chunks
+            self.compact_chunk_store()
+            return False
+
+        # Every file is in: swap the new collections in
+        for shard, target in targets.items():
+            self._replace_collection(client, self._collection_name(shard), target)
+        self.indexed_files = reindexed
+        self._save_indexed_files()
+
+        self.shards = {}
+        self.load_vector_store()
+        # Texts of the replaced chunks
+        self.compact_chunk_store()
+        logger.info(f"✓ Reindexed {len(reindexed)} file(s) (text from {origins})")
+        return True
@@ -0,0 +1,96 @@
+import re
+import hashlib
+from typing import List
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+import core.document_loader
+import core.rag_logic
+from core.rag_logic import RagLogic
+from core.vector_db import VectorDB
+from core.parse_cache import parse_cache
+from core.document_loader import FileLoader
+
+
+class FakeEmbeddings(Embeddings):
+    """Hashed bag of words: texts sharing words end up close, no model download."""
+    dim = 64
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim)
+        vector[0] = 0.01
+        for word in re.findall(r"\w+", text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+@pytest.fixture(autouse=True)
+def isolated_parse_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(parse_cache, "cache_dir", str(tmp_path / "parse_cache"))
+    monkeypatch.setattr(parse_cache, "enabled", True)
+    return parse_cache
+
+
+@pytest.fixture
+def make_rag_logic(monkeypatch):
+    monkeypatch.setattr(core.rag_logic, "HuggingFaceEmbeddings", lambda **kwargs: FakeEmbeddings())
+    return lambda chunk_size=200, chunk_overlap=40: RagLogic(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+@pytest.fixture
+def make_vector_db(tmp_path, make_rag_logic):
+    """VectorDBs on a temporary persist directory, closed after the test."""
+    created = []
+
+    def make(shard_names: List[str] = ("a", "b"), **kwargs) -> VectorDB:
+        kwargs.setdefault("persist_directory", str(tmp_path / "index"))
+        kwargs.setdefault("versions_dir", str(tmp_path / "versions"))
+        vector_db = VectorDB(make_rag_logic(), shard_names=list(shard_names), **kwargs)
+        created.append(vector_db)
+        return vector_db
+
+    yield make
+    for vector_db in created:
+        vector_db.close()
+
+
+class CountingLoader(FileLoader):
+    """Cacheable loader that records every real parse."""
+    name = "counting"
+
+    def __init__(self):
+        self.calls = []
+
+    def load(self, file_path, mode, option=None):
+        self.calls.append(file_path)
+        with open(file_path) as f:
+            return [Document(page_content=f.read(), metadata={"page_number": 1})]
+
+
+@pytest.fixture
+def counting_loader(monkeypatch):
+    loader = CountingLoader()
+    monkeypatch.setitem(core.document_loader._LOADERS, loader.name, loader)
+    monkeypatch.setitem(core.document_loader.STRATEGIES, "note", [(loader.name, None)])
+    return loader
+
+
+@pytest.fixture
+def write_file(tmp_path):
+    def write(name: str, text: str) -> str:
+        path = tmp_path / "docs" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+        return str(path)
+    return write
+
+
+def words(prefix: str, count: int) -> str:
+    return " ".join(f"{prefix}{i}" for i in range(count))
@@ -0,0 +1,55 @@
+import pytest
+from core.chunk_store import ChunkStore
+
+
+@pytest.fixture
+def chunk_store(tmp_path):
+    store = ChunkStore(str(tmp_path / "chunk_store.sqlite"))
+    yield store
+    store.close()
+
+
+def test_put_and_get_round_trip(chunk_store):
+    chunk_store.put_many([("a", "first chunk"), ("b", "zweiter Abschnitt ✓")])
+    assert chunk_store.get_many(["a", "b", "missing"]) == {"a": "first chunk", "b": "zweiter Abschnitt ✓"}
+    assert chunk_store.get("missing") == ""
+    assert chunk_store.count() == 2
+
+
+def test_put_replaces_existing_ids(chunk_store):
+    chunk_store.put_many([("a", "old")])
+    chunk_store.put_many([("a", "new")])
+    assert chunk_store.get("a") == "new"
+    assert chunk_store.count() == 1
+
+
+def test_get_many_beyond_parameter_batch(chunk_store):
+    items = [(f"id{i}", f"text {i}") for i in range(1200)]
+    chunk_store.put_many(items)
+    assert chunk_store.get_many([chunk_id for chunk_id, _ in items]) == dict(items)
+
+
+def test_delete_and_clear(chunk_store):
+    chunk_store.put_many([("a", "x"), ("b", "y"), ("c", "z")])
+    chunk_store.delete_many(["a", "c"])
+    assert chunk_store.ids() == ["b"]
+    chunk_store.clear()
+    assert chunk_store.count() == 0
+    assert chunk_store.size_bytes() == 0
+
+
+def test_text_is_compressed(chunk_store):
+    text = "repeated words " * 1000
+    chunk_store.put_many([("a", text)])
+    assert chunk_store.size_bytes() < len(text) / 10
+
+
+def test_persists_across_connections(tmp_path):
+    path = str(tmp_path / "store.sqlite")
+    store = ChunkStore(path)
+    store.put_many([("a", "kept")])
+    store.close()
+
+    reopened = ChunkStore(path)
+    assert reopened.get("a") == "kept"
+    reopened.close()
@@ -0,0 +1,126 @@
+import os
+import pytest
+from langchain_core.documents import Document
+import core.document_loader as document_loader
+from core.document_loader import FileLoader, PdfTextLoader, _expand_braces, find_files, parse_strategies
+
+
+@pytest.mark.parametrize("pattern, expected", [
+    ("**/*.pdf", ["**/*.pdf"]),
+    ("**/*.{pdf,txt}", ["**/*.pdf", "**/*.txt"]),
+    ("{a,b}/*.{md,txt}", ["a/*.md", "a/*.txt", "b/*.md", "b/*.txt"]),
+    ("**/*.{pdf,{doc,docx}}", ["**/*.pdf", "**/*.doc", "**/*.docx"]),
+])
+def test_expand_braces(pattern, expected):
+    assert _expand_braces(pattern) == expected
+
+
+def test_find_files(tmp_path):
+    (tmp_path / "sub").mkdir()
+    for name in ("a.pdf", "b.txt", "c.md", "sub/d.txt"):
+        (tmp_path / name).write_text("x")
+    found = find_files(str(tmp_path), "**/*.{pdf,txt}")
+    assert [path.replace(str(tmp_path.resolve()), "") for path in found] == ["/a.pdf", "/b.txt", "/sub/d.txt"]
+
+
+def test_parsed_once_then_served_from_the_cache(counting_loader, write_file, tmp_path):
+    path = write_file("a.note", "parsed text")
+    first = document_loader.document_loader(path)
+    assert counting_loader.calls == [path]
+
+    # Same content under another name: no parse, metadata follows the new file
+    moved = write_file("moved/b.note", "parsed text")
+    second = document_loader.document_loader(moved)
+    assert counting_loader.calls == [path]
+    assert second[0].page_content == "parsed text"
+    assert second[0].metadata["source"] == moved
+    assert second[0].metadata["filename"] == "b.note"
+    assert second[0].metadata["content_digest"] == first[0].metadata["content_digest"]
+    assert second[0].metadata["parser"] == first[0].metadata["parser"]
+
+
+def test_load_parsed_without_the_file(counting_loader, write_file, tmp_path):
+    path = write_file("gone.note", "kept after delete")
+    metadata = document_loader.document_loader(path)[0].metadata
+    os.remove(path)
+    [doc] = document_loader.load_parsed(path, metadata["content_digest"], metadata["parser"])
+    assert doc.page_content == "kept after delete"
+    assert doc.metadata["source"] == path
+    assert document_loader.load_parsed(path, "00" * 32, metadata["parser"]) is None
+
+
+def test_parse_strategies():
+    strategies = parse_strategies("txt|MD=text; pdf=pypdf,unstructured:hi_res;;*=unstructured")
+    assert strategies == {
+        "txt": [("text", None)],
+        "md": [("text", None)],
+        "pdf": [("pypdf", None), ("unstructured", "hi_res")],
+        "*": [("unstructured", None)]
+    }
+
+
+def test_parse_strategies_empty():
+    assert parse_strategies("") == {}
+
+
+def test_strategy_for_falls_back_to_unstructured(monkeypatch):
+    monkeypatch.setattr(document_loader, "STRATEGIES", parse_strategies("txt=text"))
+    assert document_loader.strategy_for("a.TXT") == [("text", None)]
+    assert document_loader.strategy_for("a.docx") == [("unstructured", None)]
+
+
+def test_loader_is_abstract():
+    with pytest.raises(TypeError):
+        FileLoader()
+
+
+class CountingPdfLoader(PdfTextLoader):
+    def __init__(self):
+        self.calls = 0
+
+    def load(self, file_path, mode, option=None):
+        self.calls += 1
+        return super().load(file_path, mode, option)
+
+
+class OcrLoader(FileLoader):
+    name = "unstructured"
+
+    def __init__(self):
+        self.calls = 0
+
+    def load(self, file_path, mode, option=None):
+        self.calls += 1
+        return [Document(page_content="text recognised by OCR", metadata={"page_number": 1})]
+
+
+def test_scanned_pdf_falls_through_to_unstructured_once(monkeypatch, tmp_path):
+    pypdf = CountingPdfLoader()
+    ocr = OcrLoader()
+    monkeypatch.setitem(document_loader._LOADERS, "pypdf", pypdf)
+    monkeypatch.setitem(document_loader._LOADERS, "unstructured", ocr)
+    monkeypatch.setitem(document_loader.STRATEGIES, "pdf", [("pypdf", None), ("unstructured", "hi_res")])
+
+    # Pages without a text layer, like a scan
+    from pypdf import PdfWriter
+    writer = PdfWriter()
+    for _ in range(3):
+        writer.add_blank_page(width=612, height=792)
+    path = str(tmp_path / "scan.pdf")
+    with open(path, "wb") as f:
+        writer.write(f)
+
+    [doc] = document_loader.document_loader(path)
+    assert doc.page_content == "text recognised by OCR"
+    assert doc.metadata["parser"].startswith("unstructured-hi_res-single-")
+    assert (pypdf.calls, ocr.calls) == (1, 1)
+
+    # pypdf's decline and the OCR result are both cached
+    document_loader.document_loader(path)
+    assert (pypdf.calls, ocr.calls) == (1, 1)
+
+
+def test_unknown_loader_is_skipped(monkeypatch, write_file):
+    monkeypatch.setitem(document_loader.STRATEGIES, "txt", [("missing", None), ("text", None)])
+    [doc] = document_loader.document_loader(write_file("a.txt", "plain text"))
+    assert doc.page_content == "plain text"
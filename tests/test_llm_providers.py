@@ -0,0 +1,62 @@
+import time
+import pytest
+from core.llm_providers import LLMProvider, StubProvider, HedgedProvider, StreamHandle, LLMTimeoutError
+
+PROMPT = "Context:\nThe refund window is 30 days.\n\nQuestion: How long is the refund window?"
+
+
+class FailingProvider(LLMProvider):
+    name = "failing"
+
+    def stream(self, prompt, timeout=1.0, handle=None):
+        raise ConnectionError("provider unavailable")
+        yield
+
+
+def test_provider_is_abstract():
+    with pytest.raises(TypeError):
+        LLMProvider()
+
+
+def test_stub_is_deterministic():
+    stub = StubProvider()
+    answer = stub.generate(PROMPT)
+    assert answer == stub.generate(PROMPT)
+    assert "refund window" in answer
+
+
+def test_stub_stops_on_cancel():
+    handle = StreamHandle()
+    handle.cancel()
+    assert list(StubProvider(first_token_ms=5000).stream(PROMPT, handle=handle)) == []
+
+
+def test_fast_primary_wins_without_hedging():
+    backup = StubProvider(model="backup")
+    hedged = HedgedProvider(StubProvider(), backup, hedge_after_ms=1000)
+    assert hedged.generate(PROMPT) == StubProvider().generate(PROMPT)
+
+
+def test_slow_primary_is_hedged():
+    hedged = HedgedProvider(StubProvider(first_token_ms=5000), StubProvider(), hedge_after_ms=20)
+    start = time.monotonic()
+    answer = hedged.generate(PROMPT, timeout=5)
+    assert time.monotonic() - start < 2
+    assert "refund window" in answer
+
+
+def test_failed_primary_falls_back_to_backup():
+    hedged = HedgedProvider(FailingProvider(), StubProvider(), hedge_after_ms=1000)
+    assert "refund window" in hedged.generate(PROMPT)
+
+
+def test_both_failing_raises():
+    hedged = HedgedProvider(FailingProvider(), FailingProvider(), hedge_after_ms=10)
+    with pytest.raises(ConnectionError):
+        hedged.generate(PROMPT)
+
+
+def test_timeout_when_nobody_answers():
+    slow = HedgedProvider(StubProvider(first_token_ms=5000), StubProvider(first_token_ms=5000), hedge_after_ms=10)
+    with pytest.raises(LLMTimeoutError):
+        slow.generate(PROMPT, timeout=0.2)
@@ -0,0 +1,68 @@
+import gzip
+from langchain_core.documents import Document
+from core.parse_cache import ParseCache, file_digest
+
+DIGEST = "ab" * 32
+TAG = "unstructured-single-1.0"
+
+
+def test_path_metadata_comes_from_the_loaded_file(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    cache.put(DIGEST, TAG, [
+        Document(page_content="first", metadata={
+            "source": "/old/dir/report.pdf", "filename": "report.pdf", "file_directory": "/old/dir", "page_number": 1
+        }),
+        Document(page_content="second", metadata={"page_number": 2})
+    ])
+
+    first, second = cache.get(DIGEST, TAG, "/new/place/renamed.pdf")
+    assert first.page_content == "first"
+    assert first.metadata == {
+        "page_number": 1, "source": "/new/place/renamed.pdf", "filename": "renamed.pdf", "file_directory": "/new/place"
+    }
+    # Keys the parser did not set are not invented
+    assert second.metadata == {"page_number": 2}
+
+
+def test_misses(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    cache.put(DIGEST, TAG, [Document(page_content="x")])
+    assert cache.get(DIGEST, "other-tag") is None
+    assert cache.get("cd" * 32, TAG) is None
+    assert ParseCache(str(tmp_path), enabled=False).get(DIGEST, TAG) is None
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    cache.put(DIGEST, TAG, [Document(page_content="x")])
+    with gzip.open(cache._path(DIGEST, TAG), "wt") as f:
+        f.write("{not json")
+    assert cache.get(DIGEST, TAG) is None
+
+
+def test_stats_and_clear(tmp_path):
+    cache = ParseCache(str(tmp_path / "cache"))
+    cache.put(DIGEST, TAG, [Document(page_content="x")])
+    assert cache.stats()["entries"] == 1
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+
+def test_file_digest(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("same content")
+    copy = tmp_path / "b.txt"
+    copy.write_text("same content")
+    assert file_digest(str(path)) == file_digest(str(copy))
+
+
+def test_declined_marker(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    assert not cache.is_declined(DIGEST, "pypdf-single-6.0")
+    cache.put_declined(DIGEST, "pypdf-single-6.0")
+    assert cache.is_declined(DIGEST, "pypdf-single-6.0")
+    assert not cache.is_declined(DIGEST, "pypdf-single-7.0")
+    # A marker is not a parse result
+    assert cache.get(DIGEST, "pypdf-single-6.0") is None
+    assert cache.stats()["entries"] == 0
+    assert not ParseCache(str(tmp_path), enabled=False).is_declined(DIGEST, "pypdf-single-6.0")
@@ -0,0 +1,90 @@
+import json
+import time
+from glob import glob
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from core.profiling import RequestProfiler
+
+
+def kept(output_dir):
+    return sorted(glob(str(output_dir / "*.trace.json")))
+
+
+def test_disabled_profiler_is_a_no_op(tmp_path):
+    profiler = RequestProfiler(sample_rate=0, slow_ms=0, output_dir=str(tmp_path))
+    with profiler.request("ask") as trace:
+        with trace.stage("retrieve"):
+            pass
+    assert not profiler.enabled
+    assert kept(tmp_path) == []
+
+
+def test_only_slow_requests_are_kept(tmp_path):
+    profiler = RequestProfiler(sample_rate=0, slow_ms=50, output_dir=str(tmp_path), interval_ms=1)
+    with profiler.request("ask"):
+        pass
+    assert kept(tmp_path) == []
+
+    with profiler.request("ask", question="slow") as trace:
+        with trace.stage("generate"):
+            time.sleep(0.08)
+    [path] = kept(tmp_path)
+    with open(path) as f:
+        dump = json.load(f)
+    assert dump["metadata"] == {"question": "slow", "reason": "slow"}
+    assert [stage["stage"] for stage in dump["stages"]] == ["generate"]
+    assert dump["stack_samples"] > 0
+    with open(path.replace(".trace.json", ".collapsed")) as f:
+        assert any(line.startswith("ask;generate;") for line in f)
+
+
+def test_nested_request_becomes_a_stage(tmp_path):
+    profiler = RequestProfiler(sample_rate=1.0, output_dir=str(tmp_path))
+    with profiler.request("ingest"):
+        with profiler.request("embed") as inner:
+            with inner.stage("batch"):
+                pass
+    [path] = kept(tmp_path)
+    with open(path) as f:
+        assert [stage["stage"] for stage in json.load(f)["stages"]] == ["embed/batch", "embed"]
+
+
+def test_rotation_keeps_newest_files(tmp_path):
+    profiler = RequestProfiler(sample_rate=1.0, output_dir=str(tmp_path), max_files=2)
+    for i in range(4):
+        with profiler.request("ask", n=i):
+            pass
+    paths = kept(tmp_path)
+    assert len(paths) == 2
+    assert len(glob(str(tmp_path / "*.collapsed"))) == 2
+    kept_requests = [json.load(open(path))["metadata"]["n"] for path in paths]
+    assert kept_requests == [2, 3]
+
+
+def test_errors_are_recorded(tmp_path):
+    profiler = RequestProfiler(sample_rate=1.0, output_dir=str(tmp_path))
+    with pytest.raises(RuntimeError):
+        with profiler.request("ask"):
+            raise RuntimeError("boom")
+    [path] = kept(tmp_path)
+    assert "boom" in json.load(open(path))["error"]
+
+
+def test_pool_workers_are_sampled_into_the_request(tmp_path):
+    def search_shard():
+        time.sleep(0.08)
+
+    profiler = RequestProfiler(sample_rate=1.0, output_dir=str(tmp_path), interval_ms=1)
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="vector-shard") as pool:
+        # Not inside a request: nothing to attach to
+        assert profiler.bind(search_shard) is search_shard
+        with profiler.request("ask") as trace:
+            with trace.stage("retrieve"):
+                pool.submit(profiler.bind(search_shard)).result()
+        assert profiler._workers == {}
+    [path] = kept(tmp_path)
+    with open(path.replace(".trace.json", ".collapsed")) as f:
+        assert any(
+            line.startswith("ask;retrieve;[vector-shard];") and "search_shard" in line
+            for line in f
+        )
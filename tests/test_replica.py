@@ -0,0 +1,91 @@
+import gc
+import os
+import weakref
+from core.snapshot import current_snapshot_path, publish_snapshot, RESCORE_SUFFIX
+from core.vector_db import VectorDB
+
+
+def test_replica_follows_published_versions(make_vector_db, make_rag_logic, write_file, tmp_path):
+    writer = make_vector_db(["a", "b"])
+    writer.process_and_add_files([write_file("first.txt", "first version text " * 30)])
+    first = writer.publish_version()
+    assert first and current_snapshot_path(writer.versions_dir) == first
+
+    replica = make_vector_db(read_only=True, persist_directory=str(tmp_path / "replica"))
+    assert replica.read_only and os.path.samefile(replica.snapshot.path, first)
+    old_hits = replica.search_hits("first version", top_k=2)
+    assert old_hits
+
+    # Reindexing gives every chunk a new id, so the old hits are not in the new version
+    writer.rag_logic = make_rag_logic(chunk_size=100, chunk_overlap=10)
+    assert writer.reindex()
+    writer.process_and_add_files([write_file("second.txt", "second version text " * 30)])
+    second = writer.publish_version()
+
+    replica.reload_if_updated()
+    assert os.path.samefile(replica.snapshot.path, second)
+    assert not replica.reload_if_updated()
+    assert "second.txt" in {hit.metadata["filename"] for hit in replica.search_hits("second version", top_k=2)}
+
+    # Hits found just before the swap still hydrate from the previous version
+    assert replica.snapshot.get_texts([old_hits[0].id]) == {}
+    assert "first version text" in replica.get_chunk_text(old_hits[0])
+
+
+def test_replica_cannot_write(make_vector_db, write_file, tmp_path):
+    writer = make_vector_db()
+    writer.process_and_add_files([write_file("doc.txt", "replica write check " * 10)])
+    writer.publish_version()
+
+    replica = make_vector_db(read_only=True, persist_directory=str(tmp_path / "replica"))
+    assert not replica.process_and_add_files([write_file("new.txt", "should not be indexed")])
+    assert replica.publish_version() is None
+
+
+def test_scheduled_publishes_are_batched(make_vector_db, write_file):
+    writer = make_vector_db()
+    for i in range(3):
+        writer.process_and_add_files([write_file(f"doc{i}.txt", f"batched upload {i} " * 10)])
+        writer.schedule_publish(delay=60)
+    # close() publishes the pending version right away, once
+    writer.close()
+    versions = [name for name in os.listdir(writer.versions_dir) if name.endswith(".ragsnap")]
+    assert len(versions) == 1
+
+
+def test_versions_dir_follows_persist_directory(make_vector_db, monkeypatch, tmp_path):
+    monkeypatch.setattr("core.snapshot.INDEX_VERSIONS_DIR", "")
+    db = make_vector_db(persist_directory=str(tmp_path / "scratch"), versions_dir=None)
+    assert db.versions_dir == os.path.join(str(tmp_path / "scratch"), "versions")
+    assert os.path.dirname(db.publish_version()) == db.versions_dir
+
+
+def test_dropped_replica_is_collected(make_vector_db, make_rag_logic, write_file, tmp_path):
+    writer = make_vector_db(["a", "b"])
+    writer.process_and_add_files([write_file("doc.txt", "replica text " * 30)])
+    writer.publish_version()
+
+    # Built directly: the fixture would keep it alive until teardown
+    replica = VectorDB(
+        make_rag_logic(), shard_names=["a", "b"], read_only=True,
+        persist_directory=str(tmp_path / "replica"), versions_dir=writer.versions_dir
+    )
+    assert replica.search_hits("replica text", top_k=1)
+    watcher, dropped, rag_logic = replica._watcher, weakref.ref(replica), weakref.ref(replica.rag_logic)
+    assert watcher.is_alive()
+
+    del replica
+    gc.collect()
+    assert dropped() is None and rag_logic() is None
+    watcher.join(timeout=5)
+    assert not watcher.is_alive()
+
+
+def test_pruning_removes_rescore_rows(make_vector_db, write_file):
+    writer = make_vector_db()
+    writer.process_and_add_files([write_file("doc.txt", "pruned version text " * 30)])
+    for _ in range(3):
+        latest = publish_snapshot(writer, keep=1, codec_name="int8")
+    assert sorted(os.listdir(writer.versions_dir)) == sorted(
+        ["CURRENT", os.path.basename(latest), os.path.basename(latest) + RESCORE_SUFFIX]
+    )
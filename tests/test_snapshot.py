@@ -0,0 +1,183 @@
+import os
+import uuid
+from types import SimpleNamespace
+from typing import Dict, List
+import numpy as np
+import pytest
+import chromadb
+from core.chunk_store import ChunkStore
+from core.snapshot import (
+    SnapshotIndex, export_snapshot, import_snapshot, open_snapshot, read_snapshot_header,
+    SNAPSHOT_FORMAT_VERSION, RESCORE_SUFFIX
+)
+
+
+class FakeVectorDB:
+    """What export_snapshot reads from a VectorDB, with vectors chosen by the test."""
+
+    def __init__(self, shard_names: List[str], chunk_store: ChunkStore):
+        client = chromadb.EphemeralClient()
+        prefix = uuid.uuid4().hex[:8]
+        self.shard_names = shard_names
+        self.shards = {
+            shard: SimpleNamespace(_collection=client.create_collection(f"{prefix}_{shard}"))
+            for shard in shard_names
+        }
+        self.rag_logic = SimpleNamespace(model_name="test-model")
+        self.chunk_store = chunk_store
+        self.files: List[str] = []
+
+    def add(self, shard: str, ids: List[str], vectors: np.ndarray, metadatas: List[Dict], texts: List[str]) -> None:
+        self.chunk_store.put_many(zip(ids, texts))
+        self.shards[shard]._collection.add(ids=ids, embeddings=vectors.tolist(), metadatas=metadatas)
+        self.files.extend(m["source"] for m in metadatas if m["source"] not in self.files)
+
+    def get_chunk_texts(self, hits) -> Dict[str, str]:
+        return self.chunk_store.get_many([hit.id for hit in hits])
+
+    def get_indexed_files(self) -> List[str]:
+        return sorted(self.files)
+
+
+def unit_vectors(count: int, dim: int = 32, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def exported(tmp_path):
+    chunk_store = ChunkStore(str(tmp_path / "chunk_store.sqlite"))
+
+    def export(codec_name: str = "float16"):
+        db = FakeVectorDB(["a", "b"], chunk_store)
+        vectors = unit_vectors(60)
+        for shard, rows in (("a", range(0, 40)), ("b", range(40, 60))):
+            db.add(
+                shard,
+                ids=[f"chunk-{i:03d}" for i in rows],
+                vectors=vectors[list(rows)],
+                metadatas=[{"source": f"/docs/{i % 3}.pdf", "page": i % 5, "chunk_id": i} for i in rows],
+                texts=[f"text of chunk {i}" for i in rows]
+            )
+        path = str(tmp_path / f"index-{codec_name}.ragsnap")
+        export_snapshot(db, path, codec_name=codec_name)
+        return path, vectors
+    yield export
+    chunk_store.close()
+
+
+def test_round_trip(exported):
+    path, vectors = exported()
+    header, _ = read_snapshot_header(path)
+    assert header["format_version"] == SNAPSHOT_FORMAT_VERSION
+    assert header["indexed_files"] == ["/docs/0.pdf", "/docs/1.pdf", "/docs/2.pdf"]
+
+    index = SnapshotIndex(path, expected_model="test-model")
+    assert index.count == 60
+    assert index.shard_counts() == {"a": 40, "b": 20}
+    for row in range(index.count):
+        chunk_id = index.id_at(row)
+        assert index.row_of(chunk_id) == row
+        i = int(chunk_id.split("-")[1])
+        np.testing.assert_allclose(index.vectors[row].astype(np.float32), vectors[i], atol=1e-3)
+        assert index.metadata_at(row)["chunk_id"] == i
+    assert index.row_of("chunk-999") is None
+    assert index.get_texts(["chunk-005", "chunk-050"]) == {
+        "chunk-005": "text of chunk 5", "chunk-050": "text of chunk 50"
+    }
+
+
+@pytest.mark.parametrize("codec_name", ["float16", "int8"])
+def test_search(exported, codec_name):
+    path, vectors = exported(codec_name)
+    index = SnapshotIndex(path, expected_model="test-model")
+
+    results = index.search(vectors[12].tolist(), top_k=3)
+    assert results[0][0] == "chunk-012"
+    assert results[0][1] == pytest.approx(1.0, abs=1e-2)
+    assert [score for _, score, _ in results] == sorted((score for _, score, _ in results), reverse=True)
+
+    # Shard and metadata filters restrict the candidates
+    assert all(m["shard"] == "b" for _, _, m in index.search(vectors[12].tolist(), top_k=5, shards=["b"]))
+    filtered = index.search(vectors[12].tolist(), top_k=5, filter={"source": {"$in": ["/docs/1.pdf"]}})
+    assert filtered and all(m["source"] == "/docs/1.pdf" for _, _, m in filtered)
+
+
+def test_rescore_rows_live_in_a_side_file(exported, tmp_path):
+    float16_path, _ = exported("float16")
+    int8_path, vectors = exported("int8")
+    assert not os.path.exists(float16_path + RESCORE_SUFFIX)
+    # The scanned file shrinks; the float16 rows are only in the side file
+    assert os.path.getsize(int8_path) < os.path.getsize(float16_path)
+    assert os.path.getsize(int8_path + RESCORE_SUFFIX) == vectors.size * 2
+
+    installed = import_snapshot(int8_path, persist_directory=str(tmp_path / "replica"), expected_model="test-model")
+    index = SnapshotIndex(installed, expected_model="test-model")
+    assert index.rescore_size_bytes() == vectors.size * 2
+    assert index.search(vectors[7].tolist(), top_k=1)[0][0] == "chunk-007"
+
+    os.remove(installed + RESCORE_SUFFIX)
+    with pytest.raises(ValueError, match="re-scoring rows"):
+        SnapshotIndex(installed, expected_model="test-model")
+
+
+def test_wrong_embedding_model(exported):
+    path, _ = exported()
+    with pytest.raises(ValueError):
+        SnapshotIndex(path, expected_model="another-model")
+
+
+def test_other_format_versions_are_refused(exported):
+    path, _ = exported()
+    with open(path, "rb") as f:
+        data = f.read()
+    current = f'"format_version": {SNAPSHOT_FORMAT_VERSION},'.encode()
+    other = f'"format_version": {SNAPSHOT_FORMAT_VERSION + 1},'.encode()
+    with open(path, "wb") as f:
+        f.write(data.replace(current, other, 1))
+    with pytest.raises(ValueError, match="format version"):
+        read_snapshot_header(path)
+
+
+def test_open_snapshot_shares_instances(exported):
+    path, _ = exported()
+    assert open_snapshot(path, expected_model="test-model") is open_snapshot(path, expected_model="test-model")
+
+
+@pytest.mark.parametrize("filter, expected", [
+    ({"source": "a.pdf"}, True),
+    ({"source": "b.pdf"}, False),
+    ({"page": {"$eq": 2}}, True),
+    ({"page": {"$in": [1, 3]}}, False),
+    ({"$and": [{"source": "a.pdf"}, {"page": {"$in": [2, 3]}}]}, True),
+    ({"$and": [{"source": "a.pdf"}, {"page": 3}]}, False),
+    ({"missing": {"$in": ["x"]}}, False),
+])
+def test_matches(filter, expected):
+    assert SnapshotIndex._matches({"source": "a.pdf", "page": 2}, filter) is expected
+
+
+@pytest.mark.parametrize("filter", [
+    {"page": {"$gt": 1}},
+    {"$or": [{"page": 1}, {"page": 2}]},
+    {"$and": [{"source": "b.pdf"}, {"page": {"$ne": 1}}]},
+])
+def test_unsupported_operators_raise(filter):
+    # Checked up front, even where evaluation would short-circuit
+    with pytest.raises(ValueError):
+        SnapshotIndex._check_filter(filter)
+
+
+def test_vector_db_serves_an_exported_snapshot(tmp_path, make_vector_db, write_file):
+    source = make_vector_db(["a", "b"])
+    source.process_and_add_files([write_file("notes.txt", "snapshot serving check " * 30)])
+    path = str(tmp_path / "exported.ragsnap")
+    export_snapshot(source, path)
+
+    served = make_vector_db(snapshot_path=path, persist_directory=str(tmp_path / "unused"))
+    assert served.read_only and served.is_ready()
+    hits = served.search_hits("snapshot serving", top_k=2)
+    assert hits and hits[0].metadata["filename"] == "notes.txt"
+    assert "snapshot serving check" in served.get_chunk_text(hits[0])
+    assert served.get_indexed_files() == source.get_indexed_files()
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from core.vector_codecs import VectorCodec, Float16Codec, Int8Codec, PQCodec, get_codec, load_codec
+
+
+def unit_vectors(count: int, dim: int = 32, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_codec_is_abstract():
+    with pytest.raises(TypeError):
+        VectorCodec()
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        get_codec("float8")
+
+
+def test_float16_scores_match_exact():
+    vectors = unit_vectors(200)
+    query = vectors[0]
+    codec = Float16Codec().fit(vectors)
+    codes = codec.encode(vectors)
+    assert codes.dtype == np.float16
+    assert not codec.needs_rescoring
+    np.testing.assert_allclose(codec.score(codes, query), vectors @ query, atol=1e-2)
+
+
+def test_int8_scores_close_to_exact():
+    vectors = unit_vectors(500)
+    query = vectors[3]
+    codec = Int8Codec().fit(vectors)
+    codes = codec.encode(vectors)
+    assert codes.dtype == np.int8
+    assert codec.needs_rescoring
+    scores = codec.score(codes, query)
+    np.testing.assert_allclose(scores, vectors @ query, atol=0.05)
+    assert int(np.argmax(scores)) == 3
+
+
+def test_pq_codes_and_nearest_neighbour():
+    vectors = unit_vectors(1000)
+    query = vectors[7]
+    codec = PQCodec(subvectors=8, ksub=16, iterations=5).fit(vectors)
+    codes = codec.encode(vectors)
+    assert codes.shape == (1000,) + codec.code_shape(vectors.shape[1])
+    assert codes.dtype == np.uint8
+    scores = codec.score(codes, query)
+    assert scores.shape == (1000,)
+    # Approximate, but the query's own vector should rank near the top
+    assert 7 in np.argsort(-scores)[:10]
+
+
+@pytest.mark.parametrize("codec", [Int8Codec(), PQCodec(subvectors=8, ksub=16, iterations=5)])
+def test_params_round_trip(codec):
+    vectors = unit_vectors(300)
+    codec.fit(vectors)
+    restored = load_codec(codec.config(), codec.params(), vectors.shape[1])
+    np.testing.assert_array_equal(restored.encode(vectors), codec.encode(vectors))
+    np.testing.assert_allclose(
+        restored.score(codec.encode(vectors), vectors[0]),
+        codec.score(codec.encode(vectors), vectors[0]),
+        rtol=1e-6
+    )
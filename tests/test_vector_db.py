@@ -0,0 +1,214 @@
+import os
+import pytest
+from core.vector_db import VectorDB, SearchHit, apply_relevance_cutoff, _stitch
+from tests.conftest import words
+
+
+def test_explicit_shard_wins(make_vector_db):
+    vector_db = make_vector_db(["a", "b"])
+    assert vector_db.shard_for({"shard": "b", "source": "/docs/x.txt"}) == "b"
+
+
+def test_unknown_explicit_shard_raises(make_vector_db):
+    vector_db = make_vector_db(["a", "b"])
+    with pytest.raises(ValueError):
+        vector_db.shard_for({"shard": "c"})
+
+
+def test_shard_key_naming_a_shard(make_vector_db):
+    # SHARD_KEY defaults to source
+    vector_db = make_vector_db(["a", "b"])
+    assert vector_db.shard_for({"source": "b"}) == "b"
+
+
+def test_hashed_routing_is_stable(make_vector_db):
+    vector_db = make_vector_db(["s0", "s1", "s2", "s3"])
+    sources = [f"/docs/report-{i}.pdf" for i in range(50)]
+    first = [vector_db.shard_for({"source": source}) for source in sources]
+    assert first == [vector_db.shard_for({"source": source}) for source in sources]
+    assert set(first) == {"s0", "s1", "s2", "s3"}
+
+
+def test_resolve_shards(make_vector_db):
+    vector_db = make_vector_db(["a", "b"])
+    assert vector_db._resolve_shards(None) == ["a", "b"]
+    assert vector_db._resolve_shards(["b", "missing"]) == ["b"]
+    assert vector_db._resolve_shards(["missing"]) == []
+
+
+@pytest.fixture
+def two_shard_db(make_vector_db, write_file):
+    vector_db = make_vector_db(["a", "b"])
+    assert vector_db.process_and_add_files([write_file("apples.txt", "apple orchard harvest " * 20)], shard="a")
+    assert vector_db.process_and_add_files([write_file("pears.txt", "pear orchard harvest " * 20)], shard="b")
+    assert vector_db.process_and_add_files([write_file("other.txt", words("noise", 200))], shard="b")
+    return vector_db
+
+
+def test_search_merges_shards_by_score(two_shard_db):
+    hits = two_shard_db.search_hits("orchard harvest", top_k=4)
+    assert len(hits) == 4
+    assert {hit.shard for hit in hits} == {"a", "b"}
+    assert [hit.score for hit in hits] == sorted((hit.score for hit in hits), reverse=True)
+    assert all(hit.metadata["filename"] in ("apples.txt", "pears.txt") for hit in hits)
+
+
+def test_search_selected_shards(two_shard_db):
+    hits = two_shard_db.search_hits("orchard harvest", top_k=3, shards=["a"])
+    assert hits and all(hit.shard == "a" for hit in hits)
+
+
+def test_stats_count_every_shard(two_shard_db):
+    stats = two_shard_db.get_stats()
+    assert stats["total_files"] == 3
+    assert stats["total_chunks"] == sum(stats["shards"].values())
+    assert stats["shards"]["a"] > 0 and stats["shards"]["b"] > 0
+
+
+def test_hits_are_hydrated_from_the_chunk_store(two_shard_db):
+    hits = two_shard_db.search_hits("apple orchard", top_k=2)
+    # Chroma keeps no text; hits carry only compact metadata
+    assert all(set(hit.metadata) <= {"source", "filename", "page", "chunk_id", "shard"} for hit in hits)
+    stored = two_shard_db.shards[hits[0].shard]._collection.get(ids=[hits[0].id], include=["documents"])
+    assert not stored["documents"][0]
+
+    documents = two_shard_db.hydrate(hits)
+    assert all("apple orchard" in doc.page_content for doc in documents)
+    assert documents[0].metadata["id"] == hits[0].id
+
+
+def hits(*scores):
+    return [SearchHit(id=str(i), score=score) for i, score in enumerate(scores)]
+
+
+def test_cutoff_keeps_relevant_prefix():
+    kept = apply_relevance_cutoff(hits(0.9, 0.85, 0.8, 0.4, 0.38), min_score=0.3, max_drop=0.2)
+    assert [hit.score for hit in kept] == [0.9, 0.85, 0.8]
+
+
+def test_cutoff_min_score():
+    kept = apply_relevance_cutoff(hits(0.5, 0.45, 0.2), min_score=0.3, max_drop=1.0)
+    assert [hit.score for hit in kept] == [0.5, 0.45]
+
+
+def test_cutoff_can_drop_everything():
+    assert apply_relevance_cutoff(hits(0.2, 0.1), min_score=0.3, max_drop=0.2) == []
+
+
+def test_cutoff_min_k_ignores_early_gaps():
+    kept = apply_relevance_cutoff(hits(0.9, 0.5, 0.45, 0.1), min_score=0.0, max_drop=0.2, min_k=2)
+    assert [hit.score for hit in kept] == [0.9, 0.5, 0.45]
+
+
+@pytest.mark.parametrize("chunks, expected", [
+    (["the quick brown fox jumps", "brown fox jumps over the lazy dog"], "the quick brown fox jumps over the lazy dog"),
+    (["no overlap here", "another chunk"], "no overlap here\nanother chunk"),
+    (["only one"], "only one"),
+])
+def test_stitch(chunks, expected):
+    assert _stitch(chunks) == expected
+
+
+@pytest.fixture
+def uploaded_db(make_vector_db, write_file, counting_loader):
+    """Index whose uploads were deleted after ingest, like the app's temp_ files."""
+    vector_db = make_vector_db(["a", "b"])
+    kept = write_file("kept.txt", words("kept", 300))
+    cached = write_file("temp_cached.note", words("cached", 300))
+    plain = write_file("temp_plain.txt", words("plain", 300))
+    assert vector_db.process_and_add_files([kept, cached, plain])
+    os.remove(cached)
+    os.remove(plain)
+    return vector_db
+
+
+def collection_names(vector_db):
+    return sorted(c.name for c in vector_db.vector_store._client.list_collections())
+
+
+def test_reindex_keeps_deleted_uploads(uploaded_db, make_rag_logic, counting_loader):
+    before = uploaded_db.get_stats()
+    shards = {source: entry["shard"] for source, entry in uploaded_db._indexed_sources().items()}
+
+    uploaded_db.rag_logic = make_rag_logic(chunk_size=100, chunk_overlap=20)
+    assert uploaded_db.reindex()
+
+    after = uploaded_db.get_stats()
+    assert sorted(after["indexed_files"]) == sorted(before["indexed_files"])
+    assert after["total_chunks"] > before["total_chunks"]
+    # Old texts are gone from the chunk store, no temporary collections are left
+    assert uploaded_db.chunk_store.count() == after["total_chunks"]
+    assert not any(name.endswith("_reindex") for name in collection_names(uploaded_db))
+    # Files keep their shard; nothing was parsed again
+    assert {s: e["shard"] for s, e in uploaded_db._indexed_sources().items()} == shards
+    assert len(counting_loader.calls) == 1
+
+    for prefix in ("kept", "cached", "plain"):
+        hit = uploaded_db.search_hits(f"{prefix}10 {prefix}11 {prefix}12", top_k=1)[0]
+        text = uploaded_db.get_chunk_text(hit)
+        assert text.startswith(prefix) and len(text) <= 100
+
+
+def test_failed_reindex_leaves_the_index_unchanged(uploaded_db, make_rag_logic, monkeypatch):
+    ids_before = sorted(uploaded_db.chunk_store.ids())
+    collections_before = collection_names(uploaded_db)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("embedding service down")
+
+    uploaded_db.rag_logic = make_rag_logic(chunk_size=100, chunk_overlap=20)
+    monkeypatch.setattr(uploaded_db, "_add_to_shard", fail)
+    assert not uploaded_db.reindex()
+
+    assert sorted(uploaded_db.chunk_store.ids()) == ids_before
+    assert collection_names(uploaded_db) == collections_before
+    assert uploaded_db.search_hits("plain10 plain11", top_k=1)
+
+
+def test_rebuild_keeps_every_vector(two_shard_db):
+    before = two_shard_db.get_stats()["shards"]
+    results = two_shard_db.rebuild()
+    assert {shard: results[shard]["vectors"] for shard in before} == before
+    assert two_shard_db.get_stats()["shards"] == before
+    assert not any(name.endswith("_rebuild") for name in collection_names(two_shard_db))
+    assert two_shard_db.search_hits("apple orchard", top_k=1)
+
+
+def test_swap_interrupted_after_delete_is_finished(two_shard_db, make_vector_db, monkeypatch):
+    before = two_shard_db.get_stats()["shards"]
+    live = two_shard_db._collection_name("a")
+
+    # Crash between deleting the live collection and renaming the rebuilt copy
+    with monkeypatch.context() as patch:
+        patch.setattr(
+            VectorDB, "_replace_collection",
+            staticmethod(lambda client, name, target: client.delete_collection(name))
+        )
+        two_shard_db.rebuild_shard("a")
+    assert live not in collection_names(two_shard_db)
+
+    reopened = make_vector_db(["a", "b"])
+    assert f"{live}_rebuild" not in collection_names(reopened)
+    assert reopened.get_stats()["shards"] == before
+
+
+def test_incomplete_copy_is_dropped_when_live_exists(two_shard_db):
+    before = two_shard_db.get_stats()["shards"]
+    live = two_shard_db._collection_name("a")
+    client = two_shard_db.vector_store._client
+    client.create_collection(f"{live}_rebuild")
+
+    assert not VectorDB._finish_replacement(client, live, "_rebuild")
+    two_shard_db.rebuild_shard("a")
+    assert f"{live}_rebuild" not in collection_names(two_shard_db)
+    assert client.get_collection(live).count() == before["a"]
+
+
+@pytest.mark.parametrize("shard_count, sources", [
+    (2, [f"/tmp/x/doc{i}.txt" for i in range(8)]),
+    (4, [f"temp_doc{i}.pdf" for i in range(10)]),
+])
+def test_similar_paths_spread_over_shards(make_vector_db, shard_count, sources):
+    vector_db = make_vector_db([f"s{i}" for i in range(shard_count)])
+    used = {vector_db.shard_for({"source": source}) for source in sources}
+    assert len(used) == shard_count